@@ -0,0 +1,6 @@
+"""
+Benchmarks of bond graph construction, causality assignment, equation
+derivation and visualization on synthetic graphs of increasing size.
+
+Run with `python -m benchmarks.run --help` from the repository root.
+"""
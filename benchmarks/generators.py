@@ -0,0 +1,149 @@
+"""
+Generators of synthetic bond graphs for benchmarking. Each generator takes an
+approximate number of bonds and returns the bonds of a graph with that many
+bonds, not yet added to a BondGraph, so that adding them can be timed.
+
+All generated graphs have integral causality throughout and no algebraic
+loops, so their state equations can be derived.
+"""
+
+from typing import Callable, Dict, List, Tuple
+
+from sympy import Symbol
+
+from bondgraph.common import Bond, Node
+from bondgraph.elements import (
+    Element_C,
+    Element_I,
+    Element_R,
+    Gyrator,
+    Source_effort,
+    Transformer,
+)
+from bondgraph.junctions import JunctionEqualEffort, JunctionEqualFlow
+
+
+def chain(num_bonds: int) -> List[Bond]:
+    """
+    A serial chain of equal-flow junctions, each with a resistor, driven by an
+    effort source and ending in an inertia. Two bonds per junction.
+    """
+    num_junctions = max(num_bonds // 2, 1)
+    junctions = [JunctionEqualFlow(f"j_{k}") for k in range(num_junctions)]
+    bonds = [Bond(Source_effort("se", Symbol("F")), junctions[0])]
+    for k, junction in enumerate(junctions):
+        bonds.append(Bond(junction, Element_R(f"r_{k}", Symbol(f"r_{k}"))))
+        if k + 1 < num_junctions:
+            bonds.append(Bond(junction, junctions[k + 1]))
+    bonds.append(Bond(junctions[-1], Element_I("i", Symbol("m"), Symbol("p"))))
+    return bonds
+
+
+def ladder(num_bonds: int) -> List[Bond]:
+    """
+    An RLC ladder network: cells of a series inertia and resistor on an
+    equal-flow junction followed by a shunt capacitor on an equal-effort
+    junction. Five bonds per cell.
+    """
+    num_cells = max(num_bonds // 5, 1)
+    bonds = []
+    previous: Node = Source_effort("se", Symbol("F"))
+    for k in range(num_cells):
+        series = JunctionEqualFlow(f"s_{k}")
+        shunt = JunctionEqualEffort(f"p_{k}")
+        bonds.append(Bond(previous, series))
+        bonds.append(
+            Bond(series, Element_I(f"i_{k}", Symbol(f"L_{k}"), Symbol(f"p_{k}")))
+        )
+        bonds.append(Bond(series, Element_R(f"r_{k}", Symbol(f"R_{k}"))))
+        bonds.append(Bond(series, shunt))
+        bonds.append(
+            Bond(shunt, Element_C(f"c_{k}", Symbol(f"C_{k}"), Symbol(f"q_{k}")))
+        )
+        previous = shunt
+    return bonds
+
+
+def grid(num_bonds: int) -> List[Bond]:
+    """
+    A square grid of alternating equal-effort and equal-flow junctions, bonded
+    to their right and lower neighbours. Equal-effort junctions carry a
+    capacitor and equal-flow junctions an inertia, and an effort source drives
+    a corner. About three bonds per junction.
+    """
+    side = max(int((num_bonds / 3) ** 0.5), 2)
+    junctions: Dict[Tuple[int, int], Node] = dict()
+    bonds = []
+    for row in range(side):
+        for col in range(side):
+            name = f"{row}_{col}"
+            if (row + col) % 2 == 0:
+                junction: Node = JunctionEqualEffort(f"j_{name}")
+                element: Node = Element_C(
+                    f"c_{name}", Symbol(f"C_{name}"), Symbol(f"q_{name}")
+                )
+            else:
+                junction = JunctionEqualFlow(f"j_{name}")
+                element = Element_I(
+                    f"i_{name}", Symbol(f"L_{name}"), Symbol(f"p_{name}")
+                )
+            junctions[(row, col)] = junction
+            bonds.append(Bond(junction, element))
+    for (row, col), junction in junctions.items():
+        for neighbour in ((row, col + 1), (row + 1, col)):
+            if neighbour in junctions:
+                bonds.append(Bond(junction, junctions[neighbour]))
+    # Drive an equal-flow junction, next to the corner
+    bonds.append(Bond(Source_effort("se", Symbol("F")), junctions[(0, 1)]))
+    return bonds
+
+
+def tree(num_bonds: int) -> List[Bond]:
+    """
+    A binary tree of junctions connected through alternating transformers and
+    gyrators. Every junction carries a resistor and a storage element matching
+    its type, and an effort source drives the root. About four bonds per
+    junction.
+    """
+    num_junctions = max(num_bonds // 4, 1)
+    root = JunctionEqualFlow("j_0")
+    bonds = [Bond(Source_effort("se", Symbol("F")), root)]
+    junctions: List[Node] = [root]
+    for k in range(num_junctions):
+        junction = junctions[k]
+        bonds.append(Bond(junction, Element_R(f"r_{k}", Symbol(f"R_{k}"))))
+        if isinstance(junction, JunctionEqualFlow):
+            bonds.append(
+                Bond(junction, Element_I(f"i_{k}", Symbol(f"L_{k}"), Symbol(f"p_{k}")))
+            )
+        else:
+            bonds.append(
+                Bond(junction, Element_C(f"c_{k}", Symbol(f"C_{k}"), Symbol(f"q_{k}")))
+            )
+        for child in (2 * k + 1, 2 * k + 2):
+            if child >= num_junctions:
+                break
+            # A gyrator swaps causality, so the child keeps the junction type,
+            # while a transformer passes it on and the child type flips
+            if child % 2 == 0:
+                two_port: Node = Gyrator(f"gy_{child}", Symbol(f"n_{child}"))
+                flip = False
+            else:
+                two_port = Transformer(f"tf_{child}", Symbol(f"n_{child}"))
+                flip = True
+            if isinstance(junction, JunctionEqualFlow) != flip:
+                next_junction: Node = JunctionEqualFlow(f"j_{child}")
+            else:
+                next_junction = JunctionEqualEffort(f"j_{child}")
+            bonds.append(Bond(junction, two_port))
+            bonds.append(Bond(two_port, next_junction))
+            junctions.append(next_junction)
+    return bonds
+
+
+GENERATORS: Dict[str, Callable[[int], List[Bond]]] = {
+    "chain": chain,
+    "ladder": ladder,
+    "grid": grid,
+    "tree": tree,
+}
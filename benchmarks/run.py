@@ -0,0 +1,234 @@
+"""
+Time the phases of deriving equations for synthetic bond graphs and write the
+results as JSON, optionally comparing them against a stored baseline.
+
+    python -m benchmarks.run --sizes 10 100 1000 10000 --output bench.json
+    python -m benchmarks.run --baseline bench.json
+"""
+
+import argparse
+import gc
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import sympy
+
+from bondgraph.common import Bond
+from bondgraph.core import BondGraph
+
+from benchmarks.generators import GENERATORS
+
+PHASES = ["add", "assign_causalities", "get_state_equations", "gen_graphviz"]
+
+
+def _import_gen_graphviz() -> Callable | None:
+    try:
+        from bondgraph.visualization import gen_graphviz
+    except ImportError:
+        return None
+    return gen_graphviz
+
+
+def _run_phases(bonds: List[Bond], gen_graphviz: Callable | None) -> Dict[str, float]:
+    """
+    Run each phase once on a fresh graph and return the wall time of each. The
+    phases build on each other, so every phase after the first only measures
+    its own work on top of the cached results of the previous ones.
+    """
+    times: Dict[str, float] = dict()
+    start = time.perf_counter()
+    graph = BondGraph()
+    for bond in bonds:
+        graph.add(bond)
+    times["add"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    graph.assign_causalities()
+    times["assign_causalities"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    graph.get_state_equations()
+    times["get_state_equations"] = time.perf_counter() - start
+
+    if gen_graphviz is not None:
+        start = time.perf_counter()
+        gen_graphviz(graph)
+        times["gen_graphviz"] = time.perf_counter() - start
+    return times
+
+
+def _peak_memory(bonds: List[Bond], gen_graphviz: Callable | None) -> int:
+    """
+    Peak traced memory in bytes of running all phases, measured in a separate
+    run since tracing distorts the timings.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        _run_phases(bonds, gen_graphviz)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(
+    families: List[str],
+    sizes: List[int],
+    repeat: int = 3,
+    memory: bool = True,
+) -> List[Dict]:
+    """
+    Benchmark every combination of graph family and size. Each phase is timed
+    `repeat` times on freshly generated graphs, keeping the fastest run.
+    """
+    gen_graphviz = _import_gen_graphviz()
+    results = []
+    for family in families:
+        generator = GENERATORS[family]
+        for size in sizes:
+            runs = [_run_phases(generator(size), gen_graphviz) for _ in range(repeat)]
+            result = {
+                "family": family,
+                "size": size,
+                "num_bonds": len(generator(size)),
+                "times": {phase: min(run[phase] for run in runs) for phase in runs[0]},
+            }
+            if memory:
+                result["peak_memory"] = _peak_memory(generator(size), gen_graphviz)
+            results.append(result)
+            print(_format_result(result), file=sys.stderr)
+    return results
+
+
+def fit_scaling(results: List[Dict]) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Least-squares fit of time = coefficient * num_bonds ** exponent for each
+    family and phase, in log-log space. An exponent near 1 means linear
+    scaling, near 2 quadratic.
+    """
+    points: Dict[Tuple[str, str], List[Tuple[float, float]]] = dict()
+    for result in results:
+        for phase, seconds in result["times"].items():
+            if seconds > 0.0 and result["num_bonds"] > 0:
+                points.setdefault((result["family"], phase), []).append(
+                    (math.log(result["num_bonds"]), math.log(seconds))
+                )
+
+    fits: Dict[str, Dict[str, Dict[str, float]]] = dict()
+    for (family, phase), xy in points.items():
+        if len({x for x, _ in xy}) < 2:
+            continue
+        mean_x = sum(x for x, _ in xy) / len(xy)
+        mean_y = sum(y for _, y in xy) / len(xy)
+        exponent = sum((x - mean_x) * (y - mean_y) for x, y in xy) / sum(
+            (x - mean_x) ** 2 for x, _ in xy
+        )
+        fits.setdefault(family, dict())[phase] = {
+            "exponent": exponent,
+            "coefficient": math.exp(mean_y - exponent * mean_x),
+        }
+    return fits
+
+
+def compare(results: List[Dict], baseline: List[Dict], threshold: float) -> List[str]:
+    """
+    Compare results against a baseline run with the same families and sizes.
+    Return a description of every phase that became slower by more than the
+    threshold factor, or whose peak memory grew by more than it.
+    """
+    reference = {(r["family"], r["size"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        key = (result["family"], result["size"])
+        if key not in reference:
+            continue
+        metrics = [
+            (f"time of {p}", t, reference[key]["times"].get(p))
+            for p, t in result["times"].items()
+        ]
+        if "peak_memory" in result:
+            metrics.append(
+                (
+                    "peak memory",
+                    result["peak_memory"],
+                    reference[key].get("peak_memory"),
+                )
+            )
+        for name, value, old_value in metrics:
+            if old_value and value > threshold * old_value:
+                regressions.append(
+                    f"{result['family']} {result['size']}: {name} "
+                    + f"{value / old_value:.2f}x baseline ({old_value:.4g} -> {value:.4g})"
+                )
+    return regressions
+
+
+def _format_result(result: Dict) -> str:
+    times = ", ".join(
+        f"{phase} {seconds:.4f} s" for phase, seconds in result["times"].items()
+    )
+    memory = ""
+    if "peak_memory" in result:
+        memory = f", peak {result['peak_memory'] / 2**20:.1f} MiB"
+    return f"{result['family']} {result['num_bonds']} bonds: {times}{memory}"
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--families", nargs="+", choices=list(GENERATORS), default=list(GENERATORS)
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--no-memory", action="store_true", help="skip peak memory measurement"
+    )
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results in this JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.5,
+        help="slowdown factor against the baseline counted as a regression",
+    )
+    args = parser.parse_args(argv)
+
+    results = benchmark(args.families, args.sizes, args.repeat, not args.no_memory)
+    report = {
+        "metadata": {
+            "python": platform.python_version(),
+            "sympy": sympy.__version__,
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+        "fits": fit_scaling(results),
+    }
+    for family, phases in report["fits"].items():
+        exponents = ", ".join(
+            f"{phase} n^{fit['exponent']:.2f}" for phase, fit in phases.items()
+        )
+        print(f"{family} scaling: {exponents}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
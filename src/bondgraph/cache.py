@@ -0,0 +1,78 @@
+import os
+import pickle
+import tempfile
+from typing import Any, Dict
+
+
+class EquationCache:
+    """
+    Directory of derived results keyed by graph fingerprint, see
+    BondGraph.fingerprint(). Each entry is a dictionary pickled to its own
+    file. When the total size of the entries exceeds max_bytes, the least
+    recently used entries are removed.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def get(self, key: str, structure: Any = None) -> Dict[str, Any] | None:
+        """
+        Return the entry stored under key, or None if there is none. Entries
+        that cannot be read, for example because they refer to classes that
+        have since been renamed or moved, count as misses. If structure is
+        given, so do entries stored with a different "structure" item.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                entry = pickle.load(file)
+        except Exception:
+            # Unpickling may raise almost anything, e.g. AttributeError or
+            # ImportError for stale entries
+            self.misses += 1
+            return None
+        if structure is not None and (
+            not isinstance(entry, dict) or entry.get("structure") != structure
+        ):
+            self.misses += 1
+            return None
+        # Modification time records the last use for eviction
+        os.utime(path)
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        # Write to a temporary file first so readers never see partial entries
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as file:
+            pickle.dump(entry, file)
+        os.replace(temporary_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pickle"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                status = os.stat(path)
+            except OSError:
+                continue
+            entries.append((status.st_mtime, status.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
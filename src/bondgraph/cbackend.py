@@ -0,0 +1,335 @@
+import ctypes
+import hashlib
+import os
+import subprocess
+import tempfile
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from sympy import Expr, Indexed, Symbol, ccode, cse, numbered_symbols
+
+from bondgraph.numeric import _batch_shape, _Layout
+
+_STRIDED_ARGTYPES = [ctypes.c_long, ctypes.c_double] + [
+    ctypes.c_void_p,
+    ctypes.c_long,
+    ctypes.c_long,
+] * 3
+
+
+def _channel_values(symbol: Expr) -> List[Dict]:
+    """
+    Return the index substitutions giving each channel of a vector symbol, or
+    a single empty substitution for a scalar symbol.
+    """
+    if not isinstance(symbol, Indexed):
+        return [dict()]
+    index = symbol.indices[0]
+    return [{index: value} for value in range(int(index.lower), int(index.upper) + 1)]
+
+
+def _scalar_rows(layout: _Layout) -> Dict[Expr, int]:
+    """
+    Map every scalar, or single channel of a vector symbol, to its row.
+    """
+    rows: Dict[Expr, int] = dict()
+    for symbol, row in zip(layout.symbols, layout.rows):
+        start = row.start if isinstance(row, slice) else row
+        for k, channel in enumerate(_channel_values(symbol)):
+            rows[symbol.xreplace(channel)] = start + k
+    return rows
+
+
+def _function_source(
+    name: str,
+    outputs: List[Expr],
+    substitutions: Dict[Expr, Symbol],
+    assignments: Sequence[Tuple[Symbol, Expr]] = (),
+) -> List[str]:
+    """
+    C source of a function evaluating the outputs at one point, reading state i
+    from x[i*xs] and parameter i from p[i*ps] and writing output i to
+    out[i*os], with common subexpressions computed once. The assignments, in
+    terms of the substituted symbols, are evaluated first.
+    """
+    expressions = [expr.xreplace(substitutions) for expr in outputs]
+    intermediates, reduced = cse(
+        expressions, symbols=numbered_symbols("bg_cse"), order="none"
+    )
+    lines = [
+        f"static void {name}(double t, const double *x, long xs,"
+        + " const double *p, long ps, double *out, long os)",
+        "{",
+        "    (void)t; (void)x; (void)xs; (void)p; (void)ps;",
+    ]
+    for symbol, expr in assignments:
+        lines.append(f"    const double {symbol} = {ccode(expr)};")
+    for symbol, expr in intermediates:
+        lines.append(f"    const double {symbol} = {ccode(expr)};")
+    for row, expr in enumerate(reduced):
+        lines.append(f"    out[{row}*os] = {ccode(expr)};")
+    lines.append("}")
+    return lines
+
+
+def _entry_points(name: str, function: str) -> List[str]:
+    return [
+        f"void {name}(double t, const double *x, const double *p, double *out)",
+        "{",
+        f"    {function}(t, x, 1, p, 1, out, 1);",
+        "}",
+        "",
+        f"void {name}_batch(long n, double t, const double *x, long xs, long xb,",
+        "    const double *p, long ps, long pb, double *out, long os, long ob)",
+        "{",
+        "    for (long k = 0; k < n; k++) {",
+        f"        {function}(t, x + k * xb, xs, p + k * pb, ps, out + k * ob, os);",
+        "    }",
+        "}",
+    ]
+
+
+def generate_c_source(
+    equations: Dict[Symbol, Expr],
+    parameters: Sequence[Symbol],
+    time: Symbol | None = None,
+    jacobian: Dict[Tuple[Symbol, Symbol], Expr] | None = None,
+    assignments: Sequence[Tuple[Symbol, Expr]] | None = None,
+) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Generate C source evaluating the state equations, and optionally the
+    sparse Jacobian entries, for states and parameters laid out as for
+    bondgraph.numeric.CompiledRHS. Vector equations are expanded per channel.
+
+    The source defines bg_rhs(t, x, p, out) for one point and
+    bg_rhs_batch(n, t, x, xs, xb, p, ps, pb, out, os, ob) looping over n points,
+    where the strides give the distance between rows (xs, ps, os) and between
+    points (xb, pb, ob) in doubles. With a Jacobian, bg_jac and bg_jac_batch
+    are defined likewise. Returns the source and the (row, column) position of
+    each Jacobian value. The state equations may refer to intermediate
+    variables defined by assignments, which are expanded per channel and
+    evaluated first by bg_rhs.
+    """
+    states = _Layout(list(equations.keys()))
+    parameter_layout = _Layout([p for p in parameters if p != time])
+    state_rows = _scalar_rows(states)
+    substitutions: Dict[Expr, Symbol] = {
+        scalar: Symbol(f"x[{row}*xs]") for scalar, row in state_rows.items()
+    }
+    substitutions.update(
+        {
+            scalar: Symbol(f"p[{row}*ps]")
+            for scalar, row in _scalar_rows(parameter_layout).items()
+        }
+    )
+    if time is not None:
+        substitutions[time] = Symbol("t")
+
+    # The Jacobian entries are fully inlined and never refer to assignments
+    jacobian_substitutions = dict(substitutions)
+    named: List[Tuple[Symbol, Expr]] = []
+    for lhs, rhs in assignments or ():
+        for channel in _channel_values(lhs):
+            name = Symbol(f"bg_a{len(named)}")
+            named.append((name, rhs.xreplace(channel).xreplace(substitutions)))
+            substitutions[lhs.xreplace(channel)] = name
+
+    outputs = [
+        rhs.xreplace(channel)
+        for var, rhs in equations.items()
+        for channel in _channel_values(var)
+    ]
+    lines = ["#include <math.h>", ""]
+    lines += _function_source("bg_rhs_strided", outputs, substitutions, named)
+    lines += [""] + _entry_points("bg_rhs", "bg_rhs_strided")
+
+    positions: List[Tuple[int, int]] = []
+    if jacobian is not None:
+        values = []
+        for (row, col), entry in jacobian.items():
+            for channel in _channel_values(row):
+                positions.append(
+                    (
+                        state_rows[row.xreplace(channel)],
+                        state_rows[col.xreplace(channel)],
+                    )
+                )
+                values.append(entry.xreplace(channel))
+        lines += [""] + _function_source(
+            "bg_jac_strided", values, jacobian_substitutions
+        )
+        lines += [""] + _entry_points("bg_jac", "bg_jac_strided")
+    return "\n".join(lines) + "\n", positions
+
+
+def _build_library(
+    source: str, cc: str | None, flags: Sequence[str], build_dir: str | None
+) -> ctypes.CDLL:
+    """
+    Compile the source into a shared library and load it. Libraries built in
+    build_dir are named by a hash of the source and compiler settings and
+    reused by later builds of the same source.
+    """
+    cc = cc if cc is not None else os.environ.get("CC", "cc")
+    key = hashlib.sha256("\x1f".join([source, cc, *flags]).encode()).hexdigest()
+
+    def build(directory: str) -> str:
+        library = os.path.join(directory, f"bondgraph_{key[:32]}.so")
+        if os.path.exists(library):
+            return library
+        source_path = os.path.join(directory, f"bondgraph_{key[:32]}.c")
+        with open(source_path, "w") as file:
+            file.write(source)
+        # Build under a temporary name so concurrent builds never load partial files
+        temporary = f"{library}.{os.getpid()}.tmp"
+        try:
+            subprocess.run(
+                [cc, *flags, "-shared", "-fPIC", "-o", temporary, source_path, "-lm"],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+        except FileNotFoundError:
+            raise RuntimeError(f"C compiler {cc} not found")
+        except subprocess.CalledProcessError as error:
+            raise RuntimeError(f"Compiling generated C code failed:\n{error.stderr}")
+        os.replace(temporary, library)
+        return library
+
+    if build_dir is not None:
+        os.makedirs(build_dir, exist_ok=True)
+        return ctypes.CDLL(build(build_dir))
+    with tempfile.TemporaryDirectory() as directory:
+        # The loaded library stays mapped after its file is removed
+        return ctypes.CDLL(build(directory))
+
+
+def _layout(array: np.ndarray, batch: int) -> Tuple[int, int, int]:
+    """
+    Return the address of an array of shape (rows,) or (rows, batch) with its
+    strides between rows and between points of the batch, in doubles. Arrays
+    without a batch dimension are shared by the whole batch.
+    """
+    if array.ndim == 1:
+        return array.ctypes.data, array.strides[0] // 8, 0
+    point_stride = array.strides[1] // 8 if array.shape[1] == batch else 0
+    return array.ctypes.data, array.strides[0] // 8, point_stride
+
+
+class CompiledC:
+    """
+    State equations, and optionally their Jacobian, compiled to native code.
+    Callable as f(t, x, params) like bondgraph.numeric.CompiledRHS, so it can
+    be used in its place, e.g. with bondgraph.simulation.simulate(). Batches of
+    states and parameters, of shape (rows, batch), are evaluated in a single
+    call into the library. At most one batch dimension is supported.
+    """
+
+    def __init__(
+        self,
+        equations: Dict[Symbol, Expr],
+        parameters: Sequence[Symbol],
+        time: Symbol | None = None,
+        jacobian: Dict[Tuple[Symbol, Symbol], Expr] | None = None,
+        cc: str | None = None,
+        flags: Sequence[str] = ("-O2",),
+        build_dir: str | None = None,
+        assignments: Sequence[Tuple[Symbol, Expr]] | None = None,
+    ):
+        self.states: List[Symbol] = list(equations.keys())
+        self.parameters: List[Symbol] = [p for p in parameters if p != time]
+        self.n_states = _Layout(self.states).size
+        self.n_parameters = _Layout(self.parameters).size
+        self.source, positions = generate_c_source(
+            equations, self.parameters, time, jacobian, assignments
+        )
+        self.rows = np.array([row for row, _ in positions], dtype=np.intp)
+        self.cols = np.array([col for _, col in positions], dtype=np.intp)
+        self.library = _build_library(self.source, cc, list(flags), build_dir)
+
+        self._rhs_batch = self.library.bg_rhs_batch
+        self._rhs_batch.argtypes = _STRIDED_ARGTYPES
+        self._rhs_batch.restype = None
+        self._jac_batch = None
+        if jacobian is not None:
+            self._jac_batch = self.library.bg_jac_batch
+            self._jac_batch.argtypes = _STRIDED_ARGTYPES
+            self._jac_batch.restype = None
+
+    @property
+    def nnz(self) -> int:
+        return len(self.rows)
+
+    def _evaluate(self, function, rows: int, t, x, params, out) -> np.ndarray:
+        x = np.asarray(x, dtype=float)
+        params = np.asarray(params, dtype=float)
+        if x.shape[0] != self.n_states:
+            raise ValueError(
+                f"Expected {self.n_states} states, got array of shape {x.shape}"
+            )
+        if params.shape[0] != self.n_parameters:
+            raise ValueError(
+                f"Expected {self.n_parameters} parameters, "
+                + f"got array of shape {params.shape}"
+            )
+        if x.ndim > 2 or params.ndim > 2:
+            raise ValueError("Only one batch dimension is supported")
+        batch_shape = _batch_shape(x, params)
+        if out is None:
+            out = np.empty((rows,) + batch_shape)
+        elif out.shape != (rows,) + batch_shape or out.dtype != np.float64:
+            raise ValueError(
+                f"Output must be a float array of shape {(rows,) + batch_shape}"
+            )
+        batch = batch_shape[0] if batch_shape else 1
+        # Strides are passed in doubles, so arrays must be aligned to them
+        if x.strides[-1] % 8 or params.strides[-1] % 8 or out.strides[-1] % 8:
+            raise ValueError("Arrays must be aligned to their item size")
+        function(
+            batch,
+            float(t),
+            *_layout(x, batch),
+            *_layout(params, batch),
+            *_layout(out, batch),
+        )
+        return out
+
+    def __call__(self, t, x, params, out: np.ndarray | None = None) -> np.ndarray:
+        return self._evaluate(self._rhs_batch, self.n_states, t, x, params, out)
+
+    def jacobian(self, t, x, params, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Evaluate the values of the structurally non-zero Jacobian entries, with
+        shape (nnz,) plus any batch dimension, at the positions given by the
+        `rows` and `cols` index arrays.
+        """
+        if self._jac_batch is None:
+            raise ValueError("Compiled without a Jacobian")
+        return self._evaluate(self._jac_batch, self.nnz, t, x, params, out)
+
+    def dense_jacobian(self, t, x, params) -> np.ndarray:
+        values = self.jacobian(t, x, params)
+        jacobian = np.zeros((self.n_states, self.n_states) + values.shape[1:])
+        jacobian[self.rows, self.cols] = values
+        return jacobian
+
+
+def compile_c(
+    equations: Dict[Symbol, Expr],
+    parameters: Sequence[Symbol],
+    time: Symbol | None = None,
+    jacobian: Dict[Tuple[Symbol, Symbol], Expr] | None = None,
+    cc: str | None = None,
+    flags: Sequence[str] = ("-O2",),
+    build_dir: str | None = None,
+    assignments: Sequence[Tuple[Symbol, Expr]] | None = None,
+) -> CompiledC:
+    """
+    Generate C code for the state equations, and the Jacobian entries if
+    given, compile it with the system C compiler (cc, or the CC environment
+    variable) and load it with ctypes. The state equations may refer to
+    intermediate variables defined by assignments, in evaluation order.
+    """
+    return CompiledC(
+        equations, parameters, time, jacobian, cc, flags, build_dir, assignments
+    )
@@ -0,0 +1,124 @@
+import keyword
+from typing import Dict, List, Sequence, Set, Tuple
+
+from sympy import Expr, Indexed, Symbol, cse, numbered_symbols
+from sympy.printing.numpy import NumPyPrinter
+
+from bondgraph.numeric import _Layout
+
+# Names used by the generated code itself
+_RESERVED = {"t", "x", "params", "out", "numpy", "rhs", "STATES", "PARAMETERS"}
+
+
+def _identifier(name: str, used: Set[str]) -> str:
+    """
+    Turn a symbol name into a unique Python identifier.
+    """
+    identifier = "".join(c if c.isalnum() or c == "_" else "_" for c in name)
+    if not identifier or identifier[0].isdigit() or keyword.iskeyword(identifier):
+        identifier = f"_{identifier}"
+    candidate, suffix = identifier, 1
+    while candidate in used:
+        candidate = f"{identifier}_{suffix}"
+        suffix += 1
+    used.add(candidate)
+    return candidate
+
+
+def _rows(rows: int | slice) -> str:
+    if isinstance(rows, slice):
+        return f"{rows.start}:{rows.stop}"
+    return str(rows)
+
+
+def generate_python_module(
+    equations: Dict[Symbol, Expr],
+    parameters: Sequence[Symbol],
+    time: Symbol | None = None,
+    assignments: Sequence[Tuple[Symbol, Expr]] | None = None,
+) -> str:
+    """
+    Generate the source of a standalone Python module evaluating the state
+    equations with NumPy, after eliminating common subexpressions across all of
+    them. The module only imports numpy and defines rhs(t, x, params, out=None)
+    with the same argument layout and batch support as
+    bondgraph.numeric.CompiledRHS, including the alignment of vector rows with
+    batch dimensions, along with the STATES and PARAMETERS names in
+    row order. Intermediate variables defined by assignments, in evaluation
+    order, are computed as named local variables ahead of the equations.
+    """
+    states = _Layout(list(equations.keys()))
+    parameter_layout = _Layout([p for p in parameters if p != time])
+
+    # Give every argument a valid Python name
+    used = set(_RESERVED)
+    names: Dict[Symbol, Symbol] = dict()
+    unpacking: List[str] = []
+    for array, layout in (("x", states), ("params", parameter_layout)):
+        for symbol, argument, rows in zip(
+            layout.symbols, layout.arguments, layout.rows
+        ):
+            name = _identifier(str(symbol), used)
+            names[argument] = Symbol(name)
+            unpacking.append(f"    {name} = {array}[{_rows(rows)}]")
+    if time is not None:
+        names[time] = Symbol("t")
+
+    substitutions = {
+        indexed: names[argument]
+        for layout in (states, parameter_layout)
+        for indexed, argument in layout.substitutions.items()
+    }
+    substitutions.update(names)
+    named: List[Tuple[Symbol, Expr]] = []
+    for lhs, rhs in assignments or ():
+        base = lhs.base if isinstance(lhs, Indexed) else lhs
+        name = Symbol(_identifier(str(base), used))
+        named.append((name, rhs.xreplace(substitutions)))
+        substitutions[lhs] = name
+    expressions = [rhs.xreplace(substitutions) for rhs in equations.values()]
+    prefix = "_cse"
+    while any(name.startswith(prefix) for name in used):
+        prefix = f"_{prefix}"
+    intermediates, reduced = cse(
+        expressions, symbols=numbered_symbols(prefix), order="none"
+    )
+
+    printer = NumPyPrinter({"fully_qualified_modules": True})
+    lines = [
+        '"""',
+        "State equations generated by bondgraph. Evaluate with rhs(t, x, params).",
+        '"""',
+        "import numpy",
+        "",
+        f"STATES = {[str(s) for s in states.symbols]!r}",
+        f"PARAMETERS = {[str(p) for p in parameter_layout.symbols]!r}",
+        "",
+        "",
+        "def rhs(t, x, params, out=None):",
+        "    x = numpy.asarray(x, dtype=float)",
+        "    params = numpy.asarray(params, dtype=float)",
+        f"    if x.shape[0] != {states.size}:",
+        f'        raise ValueError(f"Expected {states.size} states, got shape {{x.shape}}")',
+        f"    if params.shape[0] != {parameter_layout.size}:",
+        "        raise ValueError(",
+        f'            f"Expected {parameter_layout.size} parameters, got shape {{params.shape}}"',
+        "        )",
+        "    if out is None:",
+        "        batch_shape = numpy.broadcast_shapes(x.shape[1:], params.shape[1:])",
+        f"        out = numpy.empty(({states.size},) + batch_shape)",
+        "    # Vector rows broadcast against the batch dimensions of the other array",
+        "    if x.ndim < params.ndim:",
+        "        x = x.reshape(x.shape + (1,) * (params.ndim - x.ndim))",
+        "    elif params.ndim < x.ndim:",
+        "        params = params.reshape(params.shape + (1,) * (x.ndim - params.ndim))",
+        *unpacking,
+    ]
+    for symbol, expr in named:
+        lines.append(f"    {symbol} = {printer.doprint(expr)}")
+    for symbol, expr in intermediates:
+        lines.append(f"    {symbol} = {printer.doprint(expr)}")
+    for rows, expr in zip(states.rows, reduced):
+        lines.append(f"    out[{_rows(rows)}] = {printer.doprint(expr)}")
+    lines.append("    return out")
+    return "\n".join(lines) + "\n"
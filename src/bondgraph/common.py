@@ -2,10 +2,12 @@ from abc import ABC, abstractmethod
 from enum import Enum
 from typing import List, Tuple
 
-from sympy import Expr, Symbol
+from sympy import Expr, Idx, Symbol
 
 
 class Node:
+    __slots__ = ("name",)
+
     def __init__(self, name: str):
         self.name = name
 
@@ -14,9 +16,21 @@ class Node:
 
 
 class Bond:
-    def __init__(self, node_from: Node, node_to: Node):
+    __slots__ = (
+        "node_from",
+        "node_to",
+        "index",
+        "num",
+        "effort_in_at_to",
+        "flow_symbol",
+        "effort_symbol",
+    )
+
+    def __init__(self, node_from: Node, node_to: Node, index: Idx | None = None):
         self.node_from: Node | None = node_from
         self.node_to: Node | None = node_to
+        # Vector bonds carry one effort and flow per value of the index
+        self.index = index
         self.num: int | None = None
         self.effort_in_at_to: bool | None = None
         self.flow_symbol: Symbol | None = None
@@ -25,6 +39,15 @@ class Bond:
     def has_causality_set(self) -> bool:
         return self.effort_in_at_to is not None
 
+    def power(self) -> Expr:
+        """
+        Return the power transferred along the bond, from node_from to
+        node_to, as the product of its effort and flow symbols.
+        """
+        if self.effort_symbol is None or self.flow_symbol is None:
+            raise Exception("Bond has not been added to a graph")
+        return self.effort_symbol * self.flow_symbol
+
 
 class Causality(Enum):
     Indifferent = 0
@@ -35,6 +58,8 @@ class Causality(Enum):
 
 
 class HasStateEquations(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def state_equations(
         self, effort: Symbol, flow: Symbol
@@ -56,4 +81,11 @@ def count_bonds_with_causalities_set(bonds: List[Bond]) -> int:
 
 
 class AlgebraicLoopError(Exception):
+    def __init__(self, message: str, symbols: List[Symbol] | None = None):
+        super().__init__(message)
+        # Symbols involved in the loop, if known
+        self.symbols: List[Symbol] = symbols if symbols is not None else []
+
+
+class NonlinearGraphError(Exception):
     pass
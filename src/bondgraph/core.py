@@ -3,6 +3,9 @@ from bondgraph.elements import (
     TwoPortElement,
 )
 from bondgraph.junctions import Junction, JunctionEqualEffort, JunctionEqualFlow
+from bondgraph.cache import EquationCache
+from bondgraph.instrumentation import DerivationStats, _phase
+from bondgraph.topology import Topology, causality_array
 from bondgraph.common import (
     Causality,
     Bond,
@@ -10,8 +13,21 @@ from bondgraph.common import (
     Node,
     AlgebraicLoopError,
 )
-from typing import Dict, List
-from sympy import Expr, Symbol, Equality
+from typing import Dict, List, NamedTuple, Set, Tuple
+from sympy import (
+    Add,
+    Basic,
+    Expr,
+    Indexed,
+    IndexedBase,
+    Symbol,
+    Equality,
+    srepr,
+    sympify,
+)
+import hashlib
+import itertools
+import heapq
 import logging
 
 _BG_STATE_INIT = 0
@@ -82,27 +98,22 @@ def _populate_junction_equations(
             ):
                 continue
             # Add new equation for setting effort-in bond's flow symbol equal to the rest of the flows.
-            new_eq: Equality = Equality(
-                junction.effort_in_bond.flow_symbol, 0
-            )
-            if not isinstance(new_eq, Equality):
-                raise Exception("Invalid equation at junction")
+            flows: List[Expr] = []
             for bond in junction.bonds:
                 if bond.flow_symbol is None:
                     continue
                 if bond is junction.effort_in_bond:
                     continue
                 if junction == bond.node_to:
-                    new_eq = Equality(
-                        new_eq.lhs, new_eq.rhs + bond.flow_symbol
-                    )
+                    flows.append(bond.flow_symbol)
                 else:
-                    new_eq = Equality(
-                        new_eq.lhs, new_eq.rhs - bond.flow_symbol
-                    )
+                    flows.append(-bond.flow_symbol)
+            rhs = Add(*flows)
             if junction.effort_in_bond.node_to == junction:
-                new_eq = Equality(new_eq.lhs, -new_eq.rhs)  # type: ignore
-            other_equations.append(new_eq)
+                rhs = -rhs
+            other_equations.append(
+                Equality(junction.effort_in_bond.flow_symbol, rhs, evaluate=False)
+            )
         elif isinstance(junction, JunctionEqualFlow):
             if (
                 junction.effort_out_bond is None
@@ -110,86 +121,589 @@ def _populate_junction_equations(
             ):
                 continue
             # Add new equation for setting effort-out bond's effort symbol equal to the rest of the efforts
-            new_eq = Equality(junction.effort_out_bond.effort_symbol, 0)
+            efforts: List[Expr] = []
             for bond in junction.bonds:
                 if bond is junction.effort_out_bond:
                     continue
                 if junction == bond.node_to:
-                    new_eq = Equality(
-                        new_eq.lhs,
-                        new_eq.rhs + bond.effort_symbol,  # type: ignore
-                    )
+                    efforts.append(bond.effort_symbol)  # type: ignore
                 else:
-                    new_eq = Equality(
-                        new_eq.lhs,
-                        new_eq.rhs - bond.effort_symbol,  # type: ignore
-                    )
+                    efforts.append(-bond.effort_symbol)  # type: ignore
+            rhs = Add(*efforts)
             if junction.effort_out_bond.node_to == junction:
-                new_eq = Equality(new_eq.lhs, -new_eq.rhs)  # type: ignore
-            other_equations.append(new_eq)
+                rhs = -rhs
+            other_equations.append(
+                Equality(junction.effort_out_bond.effort_symbol, rhs, evaluate=False)
+            )
+
+
+class _DisjointSet:
+    """
+    Disjoint-set forest over symbols with path compression, where the root of
+    each set is the symbol its members should be replaced with.
+    """
+
+    def __init__(self):
+        self._parent: Dict[Symbol, Symbol] = dict()
+
+    def find(self, symbol: Symbol) -> Symbol:
+        root = symbol
+        while root in self._parent:
+            root = self._parent[root]
+        # Compress the path so later lookups are constant time
+        while symbol != root:
+            parent = self._parent[symbol]
+            self._parent[symbol] = root
+            symbol = parent
+        return root
+
+    def union(self, symbol: Symbol, representative: Symbol):
+        root = self.find(symbol)
+        representative_root = self.find(representative)
+        if root != representative_root:
+            self._parent[root] = representative_root
+
+    def substitutions(self) -> Dict[Symbol, Symbol]:
+        return {symbol: self.find(symbol) for symbol in list(self._parent)}
+
+
+def _junction_identities(junctions: List[Junction]) -> Dict[Symbol, Symbol]:
+    """
+    Resolve the equal-effort and equal-flow identities of all junctions, and
+    return a map from each identified effort or flow symbol to the symbol it
+    is ultimately equal to.
+    """
+    identities = _DisjointSet()
+    for junction in junctions:
+        if isinstance(junction, JunctionEqualEffort):
+            # All effort symbols equal the effort-in bond's effort symbol.
+            if (
+                junction.effort_in_bond is None
+                or junction.effort_in_bond.effort_symbol is None
+            ):
+                continue
+            for bond in junction.bonds:
+                if bond is junction.effort_in_bond or bond.effort_symbol is None:
+                    continue
+                identities.union(
+                    bond.effort_symbol, junction.effort_in_bond.effort_symbol
+                )
+        elif isinstance(junction, JunctionEqualFlow):
+            # All flow symbols equal the effort-out bond's flow symbol
+            if (
+                junction.effort_out_bond is None
+                or junction.effort_out_bond.flow_symbol is None
+            ):
+                continue
+            for bond in junction.bonds:
+                if bond is junction.effort_out_bond or bond.flow_symbol is None:
+                    continue
+                identities.union(bond.flow_symbol, junction.effort_out_bond.flow_symbol)
+    return identities.substitutions()
+
+
+class _Derivation:
+    """
+    Intermediate results of deriving the equations of a graph. They are kept
+    after each derivation so that the next one, after the graph has been
+    changed, only has to redo the work for equations whose inputs changed.
+    """
+
+    def __init__(self):
+        # Causality signature, equations and state equations of each node
+        self.node_equations: Dict[
+            Node, Tuple[tuple, List[Equality], List[Tuple[Symbol, Expr]]]
+        ] = dict()
+        self.identities: Dict[Symbol, Symbol] = dict()
+        # Right-hand sides keyed by left-hand side, before and after substituting
+        # junction identities
+        self.raw_equations: Dict[Symbol, Expr] = dict()
+        self.equations: Dict[Symbol, Expr] = dict()
+        self.raw_state_equations: Dict[Symbol, Expr] = dict()
+        self.state_equations: Dict[Symbol, Expr] = dict()
+        # Fully substituted right-hand sides
+        self.resolved: Dict[Symbol, Expr] = dict()
+        self.diff_eq_sys: Dict[Symbol, Expr] = dict()
+
+
+def _node_bonds(node: Node) -> List[Bond]:
+    if isinstance(node, OnePortElement):
+        bonds = [node.bond]
+    elif isinstance(node, TwoPortElement):
+        bonds = [node.bond_1, node.bond_2]
+    else:
+        bonds = getattr(node, "bonds", [])
+    return [bond for bond in bonds if bond is not None]
+
+
+def _dominant_bond(node: Node) -> Bond | None:
+    if isinstance(node, JunctionEqualEffort):
+        return node.effort_in_bond
+    if isinstance(node, JunctionEqualFlow):
+        return node.effort_out_bond
+    return None
+
+
+def _causality_signature(node: Node) -> tuple:
+    """
+    Describe everything the equations of a node depend on: its bonds and their
+    causalities, and for junctions, which bond is dominant.
+    """
+    return (
+        tuple((bond, bond.effort_in_at_to) for bond in _node_bonds(node)),
+        _dominant_bond(node),
+    )
+
+
+def _producer(bond: Bond, symbol: Expr) -> Node | None:
+    """
+    Return the node at the end of the bond that determines the given effort or
+    flow symbol of it: the node the effort comes from, or the other end for
+    the flow.
+    """
+    effort_from_start = bool(bond.effort_in_at_to)
+    if symbol == bond.effort_symbol:
+        return bond.node_from if effort_from_start else bond.node_to
+    return bond.node_to if effort_from_start else bond.node_from
+
+
+def _junction_identity(junction: Node, symbol: Expr) -> Expr | None:
+    """
+    Return the symbol of the dominant bond of a junction that the given
+    effort or flow symbol of one of its other bonds is equal to, if any.
+    """
+    dominant = _dominant_bond(junction)
+    if dominant is None:
+        return None
+    if isinstance(junction, JunctionEqualEffort):
+        identity = dominant.effort_symbol
+    else:
+        identity = dominant.flow_symbol
+    return identity if identity != symbol else None
+
+
+def _node_equations(
+    node: Node,
+) -> Tuple[List[Equality], List[Tuple[Symbol, Expr]]]:
+    equations: List[Equality] = []
+    state_equations: Dict[Symbol, Expr] = dict()
+    if isinstance(node, OnePortElement):
+        _populate_one_port_equations(state_equations, dict(), 1, equations, [node])
+    elif isinstance(node, TwoPortElement):
+        _populate_two_port_equations(equations, [node])
+    elif isinstance(node, Junction):
+        _populate_junction_equations(equations, [node])
+    return equations, list(state_equations.items())
+
+
+def _fold_parameters(
+    equations: List[Equality],
+    state_equations: List[Tuple[Symbol, Expr]],
+    values: Dict[Symbol, Expr],
+) -> Tuple[List[Equality], List[Tuple[Symbol, Expr]]]:
+    """
+    Substitute bound parameter values into the equations of a node.
+    """
+    return (
+        [Equality(eq.lhs, eq.rhs.xreplace(values), evaluate=False) for eq in equations],
+        [(var, rhs.xreplace(values)) for var, rhs in state_equations],
+    )
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) or getattr(value, "is_number", False)
+
+
+def _unchanged(
+    expr: Expr, current: Dict[Symbol, Expr], previous: Dict[Symbol, Expr]
+) -> bool:
+    """
+    Check that substituting current into expr gives the same result as
+    substituting previous did, comparing substituted values by identity.
+    """
+    return all(current.get(s) is previous.get(s) for s in expr.free_symbols)
 
 
 def _substitute_junction_equations(
-    junctions: List[Junction],
-    state_equations: Dict[Symbol, Expr],
+    derivation: _Derivation,
     other_equations: List[Equality],
+    state_equations: Dict[Symbol, Expr],
+    previous: _Derivation | None,
+    stats: DerivationStats | None = None,
 ):
-    substitutions_made = True
-    while substitutions_made:
-        substitutions_made = False
-        for junction in junctions:
-            substitutions = dict()
-            if isinstance(junction, JunctionEqualEffort):
-                # Substitute all effort symbols with the effort-in bond's effort symbol.
-                for bond in junction.bonds:
-                    if (
-                        bond is junction.effort_in_bond
-                        or bond.effort_symbol is None
-                        or junction.effort_in_bond is None
-                        or junction.effort_in_bond.effort_symbol is None
-                    ):
-                        continue
-                    substitutions[
-                        bond.effort_symbol
-                    ] = junction.effort_in_bond.effort_symbol
-            elif isinstance(junction, JunctionEqualFlow):
-                # Substitute all flow symbols with the effort-out bond's flow symbol
-                for bond in junction.bonds:
-                    if (
-                        bond is junction.effort_out_bond
-                        or bond.flow_symbol is None
-                        or junction.effort_out_bond is None
-                        or junction.effort_out_bond.flow_symbol is None
-                    ):
-                        continue
-                    if bond is junction.effort_out_bond:
-                        continue
-                    substitutions[
-                        bond.flow_symbol
-                    ] = junction.effort_out_bond.flow_symbol
-            for index, eq in enumerate(other_equations):
-                before_eq = other_equations[index]
-                replaced_eq = Equality(eq.lhs, eq.rhs.xreplace(substitutions))
-                if isinstance(replaced_eq, Equality):
-                    other_equations[index] = replaced_eq
-                if other_equations[index] != before_eq:
-                    substitutions_made = True
-            for key, val in state_equations.items():
-                before_state_eq = state_equations[key]
-                replacement = val.xreplace(substitutions)
-                if isinstance(replacement, Expr):
-                    state_equations[key] = replacement
-                if state_equations[key] != before_state_eq:
-                    substitutions_made = True
+    substitutions = derivation.identities
+    for eq in other_equations:
+        if (
+            previous is not None
+            and previous.raw_equations.get(eq.lhs) is eq.rhs
+            and all(
+                substitutions.get(s) == previous.identities.get(s)
+                for s in eq.rhs.free_symbols
+            )
+        ):
+            rhs = previous.equations[eq.lhs]
+        else:
+            rhs = eq.rhs.xreplace(substitutions) if substitutions else eq.rhs
+            if stats is not None and substitutions:
+                stats.count_xreplace("substitute_junction_equations")
+            # Keep trivial identities unsubstituted rather than making them cyclic
+            if rhs == eq.lhs:
+                rhs = eq.rhs
+        derivation.raw_equations[eq.lhs] = eq.rhs
+        derivation.equations[eq.lhs] = rhs
+    for key, val in state_equations.items():
+        if (
+            previous is not None
+            and previous.raw_state_equations.get(key) is val
+            and all(
+                substitutions.get(s) == previous.identities.get(s)
+                for s in val.free_symbols
+            )
+        ):
+            replacement = previous.state_equations[key]
+        else:
+            replacement = val.xreplace(substitutions) if substitutions else val
+            if stats is not None and substitutions:
+                stats.count_xreplace("substitute_junction_equations")
+        derivation.raw_state_equations[key] = val
+        derivation.state_equations[key] = replacement
+
+
+def _equation_dependencies(equations: Dict[Symbol, Expr]) -> Dict[Symbol, List[Symbol]]:
+    return {
+        lhs: [symbol for symbol in rhs.free_symbols if symbol in equations]
+        for lhs, rhs in equations.items()
+    }
+
+
+def _topological_order(dependencies: Dict[Symbol, List[Symbol]]) -> List[Symbol]:
+    """
+    Order the left-hand sides of equations so that every symbol comes after the
+    symbols its right-hand side depends on, given as a map from each left-hand
+    side to the left-hand sides it depends on. Raises AlgebraicLoopError with
+    the symbols of the loop if the equations depend on each other cyclically.
+    """
+    order: List[Symbol] = []
+    # Symbols are absent while unvisited, False while on the stack and True when done
+    visited: Dict[Symbol, bool] = dict()
+    for root in dependencies:
+        if root in visited:
+            continue
+        visited[root] = False
+        stack = [(root, iter(dependencies[root]))]
+        while stack:
+            symbol, remaining = stack[-1]
+            for dependency in remaining:
+                if dependency not in visited:
+                    visited[dependency] = False
+                    stack.append((dependency, iter(dependencies[dependency])))
+                    break
+                elif visited[dependency] is False:
+                    path = [entry[0] for entry in stack]
+                    loop = path[path.index(dependency) :]
+                    raise AlgebraicLoopError(
+                        "Algebraic loop detected between "
+                        + ", ".join(str(s) for s in loop),
+                        loop,
+                    )
+            else:
+                visited[symbol] = True
+                order.append(symbol)
+                stack.pop()
+    return order
+
+
+def _resolve_equations(
+    equations: Dict[Symbol, Expr],
+    previous_equations: Dict[Symbol, Expr] | None = None,
+    previous_resolved: Dict[Symbol, Expr] | None = None,
+    stats: DerivationStats | None = None,
+) -> Dict[Symbol, Expr]:
+    """
+    Substitute the equations into each other in dependency order, so that each
+    right-hand side is resolved exactly once and no longer contains any of the
+    left-hand side symbols. Results of a previous resolution are reused for
+    equations that are unchanged and whose dependencies resolved to the same
+    expressions.
+    """
+    resolved: Dict[Symbol, Expr] = dict()
+    for lhs in _topological_order(_equation_dependencies(equations)):
+        rhs = equations[lhs]
+        if (
+            previous_equations is not None
+            and previous_resolved is not None
+            and previous_equations.get(lhs) is rhs
+            and lhs in previous_resolved
+            and _unchanged(rhs, resolved, previous_resolved)
+        ):
+            resolved[lhs] = previous_resolved[lhs]
+            if stats is not None:
+                stats.count("resolve_equations_reused")
+            continue
+        if stats is not None:
+            stats.count("resolve_equations")
+        substitutions = {
+            symbol: resolved[symbol]
+            for symbol in rhs.free_symbols
+            if symbol in resolved
+        }
+        resolved[lhs] = rhs.xreplace(substitutions) if substitutions else rhs
+        if stats is not None and substitutions:
+            stats.count_xreplace("resolve_equations")
+    return resolved
+
+
+def _substitute_state_equations(
+    derivation: _Derivation,
+    previous: _Derivation | None,
+    stats: DerivationStats | None,
+) -> Dict[Symbol, Expr]:
+    diff_eq_sys: Dict[Symbol, Expr] = dict()
+    for var, rhs in derivation.state_equations.items():
+        if (
+            previous is not None
+            and previous.state_equations.get(var) is rhs
+            and var in previous.diff_eq_sys
+            and _unchanged(rhs, derivation.resolved, previous.resolved)
+        ):
+            diff_eq_sys[var] = previous.diff_eq_sys[var]
+            if stats is not None:
+                stats.count("state_equations_reused")
+            continue
+        rhs = rhs.xreplace(derivation.resolved)
+        if stats is not None:
+            stats.count("state_equations")
+            stats.count_xreplace("state_equations")
+        if isinstance(rhs, Expr):
+            diff_eq_sys[var] = rhs
+    return diff_eq_sys
+
+
+def _sparse_jacobian(
+    equations: Dict[Symbol, Expr], variables: List[Symbol]
+) -> Dict[Tuple[Symbol, Symbol], Expr]:
+    """
+    Differentiate each right-hand side only with respect to the variables it
+    actually contains, returning the structurally non-zero entries keyed by
+    (equation symbol, variable).
+    """
+    variable_index = {variable: index for index, variable in enumerate(variables)}
+    jacobian: Dict[Tuple[Symbol, Symbol], Expr] = dict()
+    for lhs, rhs in equations.items():
+        present = [s for s in rhs.free_symbols if s in variable_index]
+        for variable in sorted(present, key=variable_index.__getitem__):
+            derivative = rhs.diff(variable)
+            if derivative != 0:
+                jacobian[(lhs, variable)] = derivative
+    return jacobian
+
+
+def _node_attributes(node: Node) -> Dict[str, object]:
+    """
+    Collect the attributes of a node, both those held in slots and, for node
+    types without slots, those in its instance dictionary.
+    """
+    attributes = dict(getattr(node, "__dict__", {}))
+    for cls in type(node).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            if hasattr(node, name):
+                attributes[name] = getattr(node, name)
+    return attributes
+
+
+def _node_signature(node: Node) -> str:
+    """
+    Describe a node by its type and the symbols it holds, such as parameters
+    and state variables, without depending on its name or identity.
+    """
+    node_type = type(node)
+    attributes = []
+    for name, value in sorted(_node_attributes(node).items()):
+        if isinstance(value, Basic):
+            attributes.append(f"{name}={srepr(value)}")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            # Parameters may be given as plain numbers
+            attributes.append(f"{name}={value!r}")
+    return f"{node_type.__module__}.{node_type.__qualname__}({', '.join(attributes)})"
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+
+
+class AlgebraicEquations(NamedTuple):
+    """
+    State equations in terms of named intermediate variables. Each assignment
+    only refers to states, parameters and the variables of earlier
+    assignments, and the state equations may refer to all of them.
+    """
+
+    assignments: List[Tuple[Symbol, Expr]]
+    state_equations: Dict[Symbol, Expr]
+
+
+def _algebraic_form(
+    equations: Dict[Symbol, Expr],
+    state_equations: Dict[Symbol, Expr],
+    keep: Set[Symbol] | None = None,
+) -> AlgebraicEquations:
+    """
+    Inline the equations of variables that are used only once, or whose
+    right-hand side is a single symbol or number, and keep the other variables
+    that the state equations depend on as assignments in dependency order.
+    Every right-hand side is then part of the result at most once, so its
+    size is linear in the size of the equations.
+    """
+    dependencies = _equation_dependencies(equations)
+    uses: Dict[Symbol, int] = {lhs: 0 for lhs in equations}
+    for rhs in itertools.chain(equations.values(), state_equations.values()):
+        for symbol in rhs.free_symbols:
+            if symbol in uses:
+                uses[symbol] += 1
+
+    inlined: Dict[Symbol, Expr] = dict()
+    kept: Dict[Symbol, Expr] = dict()
+    for lhs in _topological_order(dependencies):
+        rhs = equations[lhs]
+        substitutions = {s: inlined[s] for s in rhs.free_symbols if s in inlined}
+        rhs = rhs.xreplace(substitutions) if substitutions else rhs
+        if (keep is not None and lhs in keep) or (
+            uses[lhs] > 1 and not (rhs.is_Atom or rhs.is_Indexed)
+        ):
+            kept[lhs] = rhs
+        else:
+            inlined[lhs] = rhs
+
+    state_rhs: Dict[Symbol, Expr] = dict()
+    for var, rhs in state_equations.items():
+        substitutions = {s: inlined[s] for s in rhs.free_symbols if s in inlined}
+        state_rhs[var] = rhs.xreplace(substitutions) if substitutions else rhs
+
+    # Leave out kept variables that no state equation depends on
+    needed: Set[Symbol] = set()
+    pending = [s for rhs in state_rhs.values() for s in rhs.free_symbols if s in kept]
+    while pending:
+        symbol = pending.pop()
+        if symbol in needed:
+            continue
+        needed.add(symbol)
+        pending.extend(s for s in kept[symbol].free_symbols if s in kept)
+    assignments = [(lhs, rhs) for lhs, rhs in kept.items() if lhs in needed]
+    return AlgebraicEquations(assignments, state_rhs)
+
+
+class SensitivityEquations(NamedTuple):
+    """
+    State equations augmented with the forward sensitivity equations, and the
+    sensitivity variable of each (state, parameter) pair.
+    """
+
+    equations: Dict[Symbol, Expr]
+    sensitivities: Dict[Tuple[Symbol, Symbol], Symbol]
+
+
+def _sensitivity_symbol(state: Symbol, parameter: Symbol) -> Symbol:
+    """
+    Name the derivative of a state with respect to a parameter. It is a vector
+    symbol with the index of the state if the state is a vector.
+    """
+    state_name = state.base if isinstance(state, Indexed) else state
+    parameter_name = parameter.base if isinstance(parameter, Indexed) else parameter
+    name = f"d{state_name}_d{parameter_name}"
+    if isinstance(state, Indexed):
+        return IndexedBase(name)[state.indices]
+    if isinstance(parameter, Indexed):
+        raise ValueError(
+            f"Sensitivity of scalar state {state} to vector parameter {parameter}"
+        )
+    return Symbol(name)
+
+
+def _sensitivity_equations(
+    equations: Dict[Symbol, Expr], parameters: List[Symbol]
+) -> SensitivityEquations:
+    """
+    Augment the state equations dx/dt = f(x, p) with the equations
+    dS/dt = df/dx S + df/dp of the sensitivities S = dx/dp to each parameter,
+    using the sparse Jacobian so that only structurally non-zero terms are
+    formed.
+    """
+    states = list(equations.keys())
+    jacobian = _sparse_jacobian(equations, states)
+    sensitivities = {
+        (state, parameter): _sensitivity_symbol(state, parameter)
+        for parameter in parameters
+        for state in states
+    }
+    augmented = dict(equations)
+    for parameter in parameters:
+        terms: Dict[Symbol, List[Expr]] = {state: [] for state in states}
+        for (row, col), entry in jacobian.items():
+            terms[row].append(entry * sensitivities[(col, parameter)])
+        for state, rhs in equations.items():
+            derivative = rhs.diff(parameter)
+            augmented[sensitivities[(state, parameter)]] = Add(
+                *terms[state], derivative
+            )
+    return SensitivityEquations(augmented, sensitivities)
 
 
 class BondGraph:
-    def __init__(self):
+    def __init__(self, equation_cache: EquationCache | None = None):
         self._bonds: List[Bond] = []
         self._elements: List[OnePortElement] = []
         self._junctions: List[Junction] = []
         self._two_port_elements: List[TwoPortElement] = []
+        self._bond_set: Set[Bond] = set()
+        self._topology = Topology()
+        self._state = _BG_STATE_INIT
+        # Derived results, cleared whenever the topology changes
+        self._state_equations: Dict[Symbol, Expr] | None = None
+        self._parameters: Set[Symbol] | None = None
+        self._fingerprint: str | None = None
+        # Kept across changes to the graph to allow incremental re-derivation
+        self._derivation: _Derivation | None = None
+        self._equation_cache = equation_cache
+        # Numeric values folded into the equations as they are formulated
+        self._bound_parameters: Dict[Symbol, Expr] = dict()
+        # Element holding each state variable, found on first lookup
+        self._state_nodes: Dict[Symbol, Node] | None = None
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def _invalidate(self):
+        """
+        Discard causalities and derived results after the graph has changed.
+        """
+        if self._state >= _BG_STATE_CAUSALITIES_DONE:
+            self._clear_causalities()
         self._state = _BG_STATE_INIT
+        self._topology.causality = None
+        self._state_equations = None
+        self._parameters = None
+        self._fingerprint = None
+        self._state_nodes = None
+
+    def _clear_causalities(self):
+        for bond in self._bonds:
+            bond.effort_in_at_to = None
+        for junction in self._junctions:
+            if isinstance(junction, JunctionEqualEffort):
+                junction.effort_in_bond = None
+            elif isinstance(junction, JunctionEqualFlow):
+                junction.effort_out_bond = None
+
+    def cache_info(self) -> CacheInfo:
+        """
+        Return the number of queries answered from cached causalities and
+        derived results, and the number that had to be computed.
+        """
+        return CacheInfo(self._cache_hits, self._cache_misses)
 
     def all_causalities_set(self):
         for bond in self._bonds:
@@ -229,48 +743,60 @@ class BondGraph:
         return success
 
     def add(self, bond: Bond):
-        if isinstance(bond.node_from, OnePortElement):
-            if bond.node_from in self._elements:
-                raise Exception(
-                    f"OnePortElement {bond.node_from} can only be bonded once!"
-                )
-            if bond.node_from not in self._elements:
-                self._elements.append(bond.node_from)
-            bond.node_from.bond = bond
-        elif isinstance(bond.node_from, Junction):
-            if bond.node_from not in self._junctions:
-                self._junctions.append(bond.node_from)
-            if bond not in bond.node_from.bonds:
-                bond.node_from.bonds.append(bond)
-        elif isinstance(bond.node_from, TwoPortElement):
-            if bond.node_from not in self._two_port_elements:
-                self._two_port_elements.append(bond.node_from)
-            bond.node_from.bond_2 = bond
-
-        if isinstance(bond.node_to, OnePortElement):
-            if bond.node_to in self._elements:
-                raise Exception(
-                    f"OnePortElement {bond.node_to} can only be bonded once!"
-                )
-            if bond.node_to not in self._elements:
-                self._elements.append(bond.node_to)
-            bond.node_to.bond = bond
-        elif isinstance(bond.node_to, Junction):
-            if bond.node_to not in self._junctions:
-                self._junctions.append(bond.node_to)
-            if bond not in bond.node_to.bonds:
-                bond.node_to.bonds.append(bond)
-        elif isinstance(bond.node_to, TwoPortElement):
-            if bond.node_to not in self._two_port_elements:
-                self._two_port_elements.append(bond.node_to)
-            bond.node_to.bond_1 = bond
+        self._check_index(bond)
+        self._invalidate()
+        new_bond = bond not in self._bond_set
+        for node, is_from in ((bond.node_from, True), (bond.node_to, False)):
+            known = node in self._topology.node_ids
+            if isinstance(node, OnePortElement):
+                if known:
+                    raise Exception(f"OnePortElement {node} can only be bonded once!")
+                self._elements.append(node)
+                node.bond = bond
+            elif isinstance(node, Junction):
+                if not known:
+                    self._junctions.append(node)
+                if new_bond:
+                    node.bonds.append(bond)
+            elif isinstance(node, TwoPortElement):
+                if not known:
+                    self._two_port_elements.append(node)
+                if is_from:
+                    node.bond_2 = bond
+                else:
+                    node.bond_1 = bond
+        self._topology.add_bond(bond)
+        self._bond_set.add(bond)
 
         bond.num = len(self._bonds) + 1
-        bond.flow_symbol = Symbol(f"f_{bond.num}")
-        bond.effort_symbol = Symbol(f"e_{bond.num}")
+        if bond.index is None:
+            bond.flow_symbol = Symbol(f"f_{bond.num}")
+            bond.effort_symbol = Symbol(f"e_{bond.num}")
+        else:
+            bond.flow_symbol = IndexedBase(f"f_{bond.num}")[bond.index]
+            bond.effort_symbol = IndexedBase(f"e_{bond.num}")[bond.index]
 
         self._bonds.append(bond)
 
+    def _check_index(self, bond: Bond):
+        """
+        Junctions and two-ports relate the efforts and flows of their bonds
+        channel by channel, so all their bonds must share the same index.
+        """
+        for node, is_from in ((bond.node_from, True), (bond.node_to, False)):
+            if isinstance(node, Junction):
+                others = [other for other in node.bonds if other is not bond]
+            elif isinstance(node, TwoPortElement):
+                others = [node.bond_1 if is_from else node.bond_2]
+            else:
+                continue
+            for other in others:
+                if other is not None and other.index != bond.index:
+                    raise ValueError(
+                        f"Bond with index {bond.index} cannot join {node}, which"
+                        f" already has a bond with index {other.index}"
+                    )
+
     def assign_fixed_causalities(self):
         for bond in self._bonds:
             if (
@@ -327,17 +853,95 @@ class BondGraph:
                 break
         return something_happened
 
-    def assign_causalities(self) -> None:
+    def _constraint_bonds(self, node: Node) -> List[Bond]:
+        if isinstance(node, Junction):
+            return node.bonds
+        elif isinstance(node, TwoPortElement):
+            return [b for b in (node.bond_1, node.bond_2) if b is not None]
+        return []
+
+    def assign_causalities(self, stats: DerivationStats | None = None) -> None:
+        """
+        Assign causalities using the Sequential Causality Assignment Procedure.
+
+        Junctions and two-port elements are only revisited when one of their
+        bonds has been given a causality, using a worklist ordered in the same
+        way as a full sweep over all of them would be. This gives the same
+        result as repeatedly sweeping the whole graph, in roughly linear time.
+
+        Does nothing if causalities have already been assigned since the graph
+        was last changed. Timing and iteration counts are recorded in stats,
+        if given.
+        """
+        if self._state >= _BG_STATE_CAUSALITIES_DONE:
+            self._cache_hits += 1
+            return
+        self._cache_misses += 1
+        with _phase(stats, "assign_causalities"):
+            try:
+                self._assign_causalities(stats)
+            except Exception:
+                # Leave no partial assignment behind for later edits to build on
+                self._clear_causalities()
+                raise
+
+    def _assign_causalities(self, stats: DerivationStats | None):
         self.assign_fixed_causalities()
 
+        # Junctions and two-ports in the order they would be swept
+        constraint_nodes: List[Node] = [*self._junctions, *self._two_port_elements]
+        node_index: Dict[Node, int] = {
+            node: index for index, node in enumerate(constraint_nodes)
+        }
+        # Worklist entries are (sweep number, node index) to mimic repeated sweeps
+        worklist = [(0, index) for index in range(len(constraint_nodes))]
+        scheduled: Dict[int, int] = {index: 0 for index in range(len(constraint_nodes))}
+        sweep = 0
+
+        def schedule_neighbours(bond: Bond, current: int | None):
+            for node in (bond.node_from, bond.node_to):
+                index = node_index.get(node)  # type: ignore
+                if index is None or index == current:
+                    continue
+                if current is not None and index > current:
+                    next_sweep = sweep
+                else:
+                    next_sweep = sweep + 1
+                if scheduled.get(index, -1) >= next_sweep:
+                    continue
+                scheduled[index] = next_sweep
+                heapq.heappush(worklist, (next_sweep, index))
+
+        preferred_position = 0
         while True:
-            if self.try_assign_constraint_causalities():
-                continue
-            elif self.try_assign_preferred_causality():
-                continue
-            elif self.try_assign_arbitrary_causality():
-                continue
+            while worklist:
+                sweep, index = heapq.heappop(worklist)
+                if scheduled.get(index) != sweep:
+                    continue
+                del scheduled[index]
+                if stats is not None:
+                    stats.count("causality_worklist")
+                node = constraint_nodes[index]
+                bonds = self._constraint_bonds(node)
+                before = [bond.effort_in_at_to for bond in bonds]
+                if not node.assign_constraint_causality():  # type: ignore
+                    continue
+                for bond, causality in zip(bonds, before):
+                    if bond.effort_in_at_to is not causality:
+                        schedule_neighbours(bond, index)
+
+            # Only assign preferred causality for one element at a time, then propagate
+            while preferred_position < len(self._elements):
+                element = self._elements[preferred_position]
+                preferred_position += 1
+                if stats is not None:
+                    stats.count("preferred_causality")
+                if element.assign_preferred_causality():
+                    if element.bond is not None:
+                        schedule_neighbours(element.bond, None)
+                    break
             else:
+                self.try_assign_arbitrary_causality()
                 break
 
         if self.all_causalities_set():
@@ -348,69 +952,448 @@ class BondGraph:
 
         if not self.preferred_causalities_valid():
             raise Exception("Unsupported causalities detected")
+        self._topology.causality = causality_array(self._bonds)
         self._state = _BG_STATE_CAUSALITIES_DONE
 
-    def get_state_equations(self) -> Dict[Symbol, Expr]:
+    def _formulate_equations(self, stats: DerivationStats | None = None) -> _Derivation:
+        """
+        Assign causalities if needed and formulate the equations of all nodes,
+        with junction identities substituted. Equations of nodes whose bonds
+        and causalities are unchanged since the previous derivation are reused.
+        """
         if self._state < _BG_STATE_CAUSALITIES_DONE:
-            self.assign_causalities()
+            self.assign_causalities(stats)
 
+        previous = self._derivation
+        derivation = _Derivation()
         state_equations: Dict[Symbol, Expr] = dict()
-        state_variables: Dict[int, Symbol] = dict()
-        state_counter = 1
         other_equations: List[Equality] = []
-        logging.debug("Formulating equations for one-port elements...")
-        _populate_one_port_equations(
-            state_equations,
-            state_variables,
-            state_counter,
-            other_equations,
-            self._elements,
-        )
+        logging.debug("Formulating equations for nodes...")
+        with _phase(stats, "formulate_equations"):
+            self._formulate_node_equations(
+                derivation, previous, other_equations, state_equations, stats
+            )
+
+        logging.debug("Substituting in junction equations...")
+        with _phase(stats, "junction_identities"):
+            derivation.identities = _junction_identities(self._junctions)
+        with _phase(stats, "substitute_junction_equations"):
+            _substitute_junction_equations(
+                derivation, other_equations, state_equations, previous, stats
+            )
+        if stats is not None:
+            stats.record_sizes(
+                "substitute_junction_equations",
+                itertools.chain(
+                    derivation.raw_equations.values(),
+                    derivation.raw_state_equations.values(),
+                ),
+                itertools.chain(
+                    derivation.equations.values(),
+                    derivation.state_equations.values(),
+                ),
+            )
+        return derivation
+
+    def _formulate_node_equations(
+        self,
+        derivation: _Derivation,
+        previous: _Derivation | None,
+        other_equations: List[Equality],
+        state_equations: Dict[Symbol, Expr],
+        stats: DerivationStats | None,
+    ):
+        for node in itertools.chain(
+            self._elements, self._two_port_elements, self._junctions
+        ):
+            signature = _causality_signature(node)
+            cached = previous.node_equations.get(node) if previous else None
+            if cached is not None and cached[0] == signature:
+                equations, node_state_equations = cached[1], cached[2]
+                if stats is not None:
+                    stats.count("node_equations_reused")
+            else:
+                equations, node_state_equations = _node_equations(node)
+                if self._bound_parameters:
+                    equations, node_state_equations = _fold_parameters(
+                        equations, node_state_equations, self._bound_parameters
+                    )
+                if stats is not None:
+                    stats.count("node_equations")
+            derivation.node_equations[node] = (
+                signature,
+                equations,
+                node_state_equations,
+            )
+            other_equations += equations
+            for state_eq in node_state_equations:
+                if state_eq[0] in state_equations:
+                    raise Exception(
+                        f"Duplicate state symbol encountered: {state_eq[0]}"
+                    )
+                state_equations[state_eq[0]] = state_eq[1]
 
-        logging.debug("Formulating equations for two-port elements...")
-        _populate_two_port_equations(other_equations, self._two_port_elements)
+    def _refined_labels(self) -> Dict[Node, str]:
+        """
+        Label each node by iterative neighbourhood refinement
+        (Weisfeiler-Lehman) of its type, symbols and bond orientations.
+        """
+        nodes = self.get_nodes()
+        labels = {node: _digest(_node_signature(node)) for node in nodes}
+        neighbours: Dict[Node, List[Tuple[str, Node]]] = {node: [] for node in nodes}
+        for bond in self._bonds:
+            if bond.node_from is None or bond.node_to is None:
+                continue
+            index = "" if bond.index is None else srepr(bond.index)
+            neighbours[bond.node_from].append((f"out{index}", bond.node_to))
+            neighbours[bond.node_to].append((f"in{index}", bond.node_from))
+
+        num_classes = len(set(labels.values()))
+        for _ in range(len(nodes)):
+            labels = {
+                node: _digest(
+                    labels[node],
+                    *sorted(
+                        f"{direction}:{labels[other]}"
+                        for direction, other in neighbours[node]
+                    ),
+                )
+                for node in nodes
+            }
+            refined_num_classes = len(set(labels.values()))
+            if refined_num_classes == num_classes:
+                break
+            num_classes = refined_num_classes
+        return labels
 
-        logging.debug("Formulating equations for junctions...")
-        _populate_junction_equations(other_equations, self._junctions)
+    def fingerprint(self) -> str:
+        """
+        Return a canonical hash of the structure of the graph, covering the
+        node types, the symbols held by each node and the orientation of the
+        bonds. It does not depend on node names, insertion order or object
+        identity, so structurally identical graphs built separately share the
+        same fingerprint.
 
-        logging.debug("Substituting in junction equations...")
-        _substitute_junction_equations(
-            self._junctions, state_equations, other_equations
+        Nodes are labelled by iterative neighbourhood refinement
+        (Weisfeiler-Lehman), which distinguishes all graphs whose nodes carry
+        distinct parameter symbols. Refinement can fail to tell apart some
+        symmetric graphs whose nodes repeat the same symbols, and such graphs
+        then share a fingerprint, so the on-disk cache also compares the
+        structure of each entry, see _structure(), before using it.
+        """
+        if self._fingerprint is not None:
+            return self._fingerprint
+
+        labels = self._refined_labels()
+        self._fingerprint = _digest(
+            *sorted(labels.values()),
+            *sorted(
+                f"{labels[bond.node_from]}>{labels[bond.node_to]}"  # type: ignore
+                for bond in self._bonds
+            ),
+            *sorted(
+                f"{srepr(symbol)}={srepr(value)}"
+                for symbol, value in self._bound_parameters.items()
+            ),
+        )
+        return self._fingerprint
+
+    def _structure(self) -> Tuple:
+        """
+        Return the complete structure of the graph, with nodes numbered in the
+        order of their refined labels and ties broken by insertion order. Equal
+        structures imply identical graphs, while isomorphic graphs with tied
+        labels built in a different order may differ, which only costs a
+        cache miss.
+        """
+        labels = self._refined_labels()
+        nodes = self.get_nodes()
+        order = sorted(range(len(nodes)), key=lambda k: labels[nodes[k]])
+        rank = {nodes[k]: position for position, k in enumerate(order)}
+        return (
+            tuple(labels[nodes[k]] for k in order),
+            tuple(
+                sorted(
+                    (
+                        rank[bond.node_from],
+                        rank[bond.node_to],
+                        "" if bond.index is None else srepr(bond.index),
+                    )
+                    for bond in self._bonds
+                    if bond.node_from is not None and bond.node_to is not None
+                )
+            ),
+            tuple(
+                sorted(
+                    f"{srepr(symbol)}={srepr(value)}"
+                    for symbol, value in self._bound_parameters.items()
+                )
+            ),
         )
 
-        ordered_equations = dict()
-        for eq in other_equations:
-            ordered_equations[eq.lhs] = eq.rhs
+    def _state_variables(self) -> List[Symbol]:
+        variables = []
+        for element in self._elements:
+            if isinstance(element, HasStateEquations) and element.bond is not None:
+                for state_eq in element.state_equations(
+                    element.bond.effort_symbol,  # type: ignore
+                    element.bond.flow_symbol,  # type: ignore
+                ):
+                    variables.append(state_eq[0])
+        return variables
+
+    def get_state_equations(
+        self,
+        stats: DerivationStats | None = None,
+        only: List[Symbol] | None = None,
+    ) -> Dict[Symbol, Expr]:
+        """
+        Derive the state equations of the graph, keyed by state variable. If
+        stats are given, the time spent in each phase of the derivation and
+        the work done in it are recorded there.
+
+        If only is given, just the equations of those state variables are
+        derived, following the equations they depend on backwards through the
+        graph, so that only their neighbourhood is formulated and substituted.
+        Causalities are still assigned for the whole graph.
+        """
+        if only is not None:
+            if self._state_equations is not None:
+                self._cache_hits += 1
+                return {var: self._state_equations[var] for var in only}
+            return self._slice_state_equations(list(only), stats)
+
+        cached = self._cached_state_equations(stats)
+        if cached is not None:
+            return cached
+        return dict(self._derive(stats).diff_eq_sys)
+
+    def _derive(self, stats: DerivationStats | None = None) -> _Derivation:
+        previous = self._derivation
+        derivation = self._formulate_equations(stats)
 
         logging.debug("Substituting in other equations...")
-        substitutions_made = True
-        while substitutions_made:
-            substitutions_made = False
-            substituted_equations = dict()
-            for lhs, rhs in ordered_equations.items():
-                before = rhs
-                substituted_equations[lhs] = rhs.xreplace(ordered_equations)
-                if substituted_equations[lhs] != before:
-                    substitutions_made = True
-            if substitutions_made:
-                ordered_equations = substituted_equations
+        with _phase(stats, "resolve_equations"):
+            derivation.resolved = _resolve_equations(
+                derivation.equations,
+                previous.equations if previous else None,
+                previous.resolved if previous else None,
+                stats,
+            )
+        if stats is not None:
+            stats.record_sizes(
+                "resolve_equations",
+                derivation.equations.values(),
+                derivation.resolved.values(),
+            )
 
         logging.debug("Generating differential equations...")
-        diff_eq_sys: Dict[Symbol, Expr] = dict()
-        for var, rhs in state_equations.items():
-            before = None
-            while before != rhs:
-                before = rhs
-                rhs = rhs.xreplace(ordered_equations)
+        with _phase(stats, "state_equations"):
+            diff_eq_sys = _substitute_state_equations(derivation, previous, stats)
+        if stats is not None:
+            stats.record_sizes(
+                "state_equations",
+                derivation.state_equations.values(),
+                diff_eq_sys.values(),
+            )
 
-            if isinstance(rhs, Expr):
-                diff_eq_sys[var] = rhs
+        derivation.diff_eq_sys = diff_eq_sys
+        self._store_derivation(derivation)
+        return derivation
 
-        return diff_eq_sys
+    def _resolved_derivation(self) -> _Derivation:
+        """
+        Return the derivation of the current state equations, with the resolved
+        expression of every effort and flow variable, deriving it if the
+        equations were taken from the on-disk cache.
+        """
+        self.get_state_equations()
+        derivation = self._derivation
+        if derivation is None or derivation.diff_eq_sys is not self._state_equations:
+            derivation = self._derive()
+        return derivation
 
-    def get_nodes(self) -> List[Node]:
-        import itertools
+    def get_output_equations(self, outputs: List[Expr]) -> Dict[Expr, Expr]:
+        """
+        Express outputs, such as the effort or flow symbol of a bond or its
+        power from Bond.power(), in terms of the states, parameters and inputs
+        of the graph. The outputs are substituted with the same resolved
+        variables as the state equations, so each output only costs one
+        substitution once the state equations have been derived.
+        """
+        derivation = self._resolved_derivation()
+        bond_symbols = {bond.effort_symbol for bond in self._bonds} | {
+            bond.flow_symbol for bond in self._bonds
+        }
+        equations: Dict[Expr, Expr] = dict()
+        for output in outputs:
+            output = sympify(output)
+            rhs = output.xreplace(derivation.identities).xreplace(derivation.resolved)
+            undefined = [s for s in rhs.free_symbols if s in bond_symbols]
+            if undefined:
+                raise Exception(
+                    f"Output {output} depends on undefined variables {undefined}"
+                )
+            equations[output] = rhs
+        return equations
 
+    def get_state_equation(self, symbol: Symbol) -> Expr:
+        """
+        Derive the state equation of a single state variable, see the only
+        argument of get_state_equations().
+        """
+        return self.get_state_equations(only=[symbol])[symbol]
+
+    def _state_node(self, symbol: Symbol) -> Node:
+        if self._state_nodes is None:
+            self._state_nodes = dict()
+            for element in self._elements:
+                if isinstance(element, HasStateEquations) and element.bond is not None:
+                    for var, _rhs in element.state_equations(
+                        element.bond.effort_symbol,  # type: ignore
+                        element.bond.flow_symbol,  # type: ignore
+                    ):
+                        self._state_nodes[var] = element
+        if symbol not in self._state_nodes:
+            raise ValueError(f"{symbol} is not a state variable of the graph")
+        return self._state_nodes[symbol]
+
+    def _slice_state_equations(
+        self, states: List[Symbol], stats: DerivationStats | None
+    ) -> Dict[Symbol, Expr]:
+        """
+        Derive the state equations of the given state variables from the
+        equations of only the nodes that determine the variables they depend
+        on. The junction identities met on the way are substituted before
+        resolving the equations, as get_state_equations() does for all of them.
+        """
+        if self._state < _BG_STATE_CAUSALITIES_DONE:
+            self.assign_causalities(stats)
+
+        # Equations of the visited nodes and the bond of each symbol they use
+        node_equations: Dict[Node, Dict[Symbol, Expr]] = dict()
+        bonds: Dict[Expr, Bond] = dict()
+        state_equations: Dict[Symbol, Expr] = dict()
+        equations: Dict[Symbol, Expr] = dict()
+        identities = _DisjointSet()
+
+        def visit(node: Node) -> Tuple[Dict[Symbol, Expr], List[Tuple[Symbol, Expr]]]:
+            node_other, node_state = _node_equations(node)
+            if self._bound_parameters:
+                node_other, node_state = _fold_parameters(
+                    node_other, node_state, self._bound_parameters
+                )
+            node_equations[node] = {eq.lhs: eq.rhs for eq in node_other}
+            for bond in _node_bonds(node):
+                bonds[bond.effort_symbol] = bond  # type: ignore
+                bonds[bond.flow_symbol] = bond  # type: ignore
+            if stats is not None:
+                stats.count("node_equations")
+            return node_equations[node], node_state
+
+        with _phase(stats, "slice_equations"):
+            pending: List[Expr] = []
+            for var in states:
+                node = self._state_node(var)
+                if node not in node_equations:
+                    state_equations.update(visit(node)[1])
+                pending.extend(state_equations[var].free_symbols)
+            while pending:
+                symbol = pending.pop()
+                if (
+                    symbol in equations
+                    or symbol not in bonds
+                    or (identities.find(symbol) != symbol)
+                ):
+                    continue
+                producer = _producer(bonds[symbol], symbol)
+                if producer is None:
+                    continue
+                if producer in node_equations:
+                    produced = node_equations[producer]
+                else:
+                    produced, producer_states = visit(producer)
+                    state_equations.update(producer_states)
+                rhs = produced.get(symbol)
+                if rhs is not None:
+                    equations[symbol] = rhs
+                    pending.extend(rhs.free_symbols)
+                elif isinstance(producer, Junction):
+                    identity = _junction_identity(producer, symbol)
+                    if identity is not None:
+                        identities.union(symbol, identity)
+                        pending.append(identity)
+
+        substitutions = identities.substitutions()
+        with _phase(stats, "substitute_junction_equations"):
+            for lhs, rhs in equations.items():
+                substituted = rhs.xreplace(substitutions)
+                # Keep trivial identities unsubstituted rather than making them cyclic
+                if substituted != lhs:
+                    equations[lhs] = substituted
+        with _phase(stats, "resolve_equations"):
+            resolved = _resolve_equations(equations, stats=stats)
+        with _phase(stats, "state_equations"):
+            result: Dict[Symbol, Expr] = dict()
+            for var in states:
+                rhs = state_equations[var].xreplace(substitutions)
+                result[var] = rhs.xreplace(resolved)
+                if stats is not None:
+                    stats.count_xreplace("state_equations")
+        return result
+
+    def _cached_state_equations(
+        self, stats: DerivationStats | None = None
+    ) -> Dict[Symbol, Expr] | None:
+        """
+        Return the state equations from the in-memory or on-disk cache, or None
+        if they have to be derived.
+        """
+        if self._state_equations is not None:
+            self._cache_hits += 1
+            if stats is not None:
+                stats.cache = "memory"
+            return dict(self._state_equations)
+        self._cache_misses += 1
+
+        if self._equation_cache is not None:
+            entry = self._equation_cache.get(
+                self.fingerprint(), structure=self._structure()
+            )
+            if entry is not None:
+                if stats is not None:
+                    stats.cache = "disk"
+                # Follow the element order of this graph rather than the cached one
+                cached_equations = entry["state_equations"]
+                self._state_equations = {
+                    var: cached_equations[var]
+                    for var in self._state_variables()
+                    if var in cached_equations
+                }
+                return dict(self._state_equations)
+        return None
+
+    def _store_derivation(self, derivation: _Derivation):
+        self._derivation = derivation
+        self._state_equations = derivation.diff_eq_sys
+        if self._equation_cache is not None:
+            self._equation_cache.put(
+                self.fingerprint(),
+                {
+                    "structure": self._structure(),
+                    "state_equations": derivation.diff_eq_sys,
+                },
+            )
+
+    def get_topology(self) -> Topology:
+        """
+        Return the integer-indexed store of the graph structure, with nodes and
+        bonds numbered in the order they were added. Its causality array is
+        set once causalities have been assigned.
+        """
+        return self._topology
+
+    def get_nodes(self) -> List[Node]:
         node_list = []
         for element in itertools.chain(
             self._elements, self._junctions, self._two_port_elements
@@ -418,7 +1401,12 @@ class BondGraph:
             node_list.append(element)
         return node_list
 
-    def get_parameters(self):
+    def get_parameters(self) -> Set[Symbol]:
+        if self._parameters is not None:
+            self._cache_hits += 1
+            return set(self._parameters)
+        self._cache_misses += 1
+
         parameters = set()
         for element in self._elements:
             parameters.update(element.parameter_symbols())
@@ -426,4 +1414,277 @@ class BondGraph:
         for element in self._two_port_elements:
             parameters.update(element.parameter_symbols())
 
-        return parameters
+        # Bound parameters and parameters given as numbers are not free
+        parameters = {
+            parameter
+            for parameter in parameters
+            if parameter not in self._bound_parameters and not _is_number(parameter)
+        }
+        self._parameters = parameters
+        return set(parameters)
+
+    def get_algebraic_equations(
+        self, keep: List[Symbol] | None = None
+    ) -> AlgebraicEquations:
+        """
+        Derive the state equations as ordered assignments of intermediate
+        effort and flow variables followed by state equations that refer to
+        them, instead of fully inlining every variable as
+        get_state_equations() does. Variables used in more than one equation
+        are kept as assignments, as are the variables in keep, so the size of
+        the result stays linear in the size of the graph.
+        """
+        derivation = self._formulate_equations()
+        return _algebraic_form(
+            derivation.equations,
+            derivation.state_equations,
+            set(keep) if keep is not None else None,
+        )
+
+    def _algebraic_state_equations(
+        self,
+    ) -> Tuple[Dict[Symbol, Expr], List[Tuple[Symbol, Expr]]]:
+        algebraic = self.get_algebraic_equations()
+        return algebraic.state_equations, algebraic.assignments
+
+    def bind_parameters(self, values: Dict[Symbol, float]):
+        """
+        Bind numeric values to parameters. The values are folded into the
+        equations of each element as they are formulated, so that only the
+        parameters that are not bound stay symbolic through the substitutions.
+        Bound parameters are left out of get_parameters().
+
+        Discards derived equations, which are derived again on next use.
+        """
+        for symbol, value in values.items():
+            self._bound_parameters[symbol] = sympify(value)
+        self._state_equations = None
+        self._parameters = None
+        self._fingerprint = None
+        self._derivation = None
+
+    def get_bound_parameters(self) -> Dict[Symbol, Expr]:
+        return dict(self._bound_parameters)
+
+    def get_jacobian(self) -> Dict[Tuple[Symbol, Symbol], Expr]:
+        """
+        Return the analytic Jacobian of the state equations with respect to the
+        state variables as a sparse dictionary, where the key (x_i, x_j) holds
+        the derivative of the state equation of x_i with respect to x_j. Entries
+        that are structurally zero are left out.
+        """
+        state_equations = self.get_state_equations()
+        return _sparse_jacobian(state_equations, list(state_equations.keys()))
+
+    def compile_rhs(
+        self,
+        time: Symbol | None = None,
+        inline: bool = True,
+        outputs: List[Expr] | None = None,
+    ):
+        """
+        Compile the state equations into a vectorized NumPy callable
+        f(t, x, params), see bondgraph.numeric.CompiledRHS. States are ordered
+        as returned by get_state_equations() and parameters are the ones
+        returned by get_parameters(), sorted by name. The order is available
+        in the `states` and `parameters` attributes of the returned object.
+
+        With inline=False, the equations from get_algebraic_equations() are
+        compiled instead, computing each intermediate variable once. Outputs,
+        as accepted by get_output_equations(), are compiled along with the
+        state equations and evaluated by the observe() method.
+
+        Requires numpy.
+        """
+        from bondgraph.numeric import compile_rhs
+
+        output_equations = None
+        if outputs is not None:
+            output_equations = self.get_output_equations(outputs)
+        if inline:
+            return compile_rhs(
+                self.get_state_equations(),
+                sorted(self.get_parameters(), key=str),
+                time,
+                outputs=output_equations,
+            )
+        state_equations, assignments = self._algebraic_state_equations()
+        return compile_rhs(
+            state_equations,
+            sorted(self.get_parameters(), key=str),
+            time,
+            assignments,
+            output_equations,
+        )
+
+    def get_sensitivity_equations(
+        self, parameters: List[Symbol]
+    ) -> SensitivityEquations:
+        """
+        Return the state equations augmented with the forward sensitivity
+        equations of every state with respect to each of the given parameters,
+        which must be among get_parameters(). The sensitivity of state x to
+        parameter p is the symbol dx_dp, and starts at zero unless the
+        initial state depends on p.
+        """
+        free = self.get_parameters()
+        for parameter in parameters:
+            if parameter not in free:
+                raise ValueError(f"{parameter} is not a parameter of the graph")
+        return _sensitivity_equations(self.get_state_equations(), list(parameters))
+
+    def compile_sensitivity(self, parameters: List[Symbol], time: Symbol | None = None):
+        """
+        Compile the state equations augmented with their sensitivities to the
+        given parameters, see get_sensitivity_equations(), into one vectorized
+        NumPy callable f(t, x, params) like compile_rhs(). The rows of x are the
+        states followed by the sensitivities of all states to the first
+        parameter, then to the second and so on, and params are ordered as for
+        compile_rhs().
+
+        Requires numpy.
+        """
+        from bondgraph.numeric import compile_rhs
+
+        return compile_rhs(
+            self.get_sensitivity_equations(parameters).equations,
+            sorted(self.get_parameters(), key=str),
+            time,
+        )
+
+    def compile_jacobian(self, time: Symbol | None = None):
+        """
+        Compile the Jacobian of the state equations into a vectorized NumPy
+        callable, see bondgraph.numeric.CompiledJacobian. States and parameters
+        are ordered as for compile_rhs().
+
+        Requires numpy.
+        """
+        from bondgraph.numeric import compile_jacobian
+
+        state_equations = self.get_state_equations()
+        return compile_jacobian(
+            list(state_equations.keys()),
+            _sparse_jacobian(state_equations, list(state_equations.keys())),
+            sorted(self.get_parameters(), key=str),
+            time,
+        )
+
+    def compile_c(
+        self,
+        time: Symbol | None = None,
+        jacobian: bool = True,
+        cc: str | None = None,
+        build_dir: str | None = None,
+        inline: bool = True,
+    ):
+        """
+        Compile the state equations, and their Jacobian unless jacobian is
+        False, to native code with the system C compiler, see
+        bondgraph.cbackend.CompiledC. States and parameters are ordered as for
+        compile_rhs(). With inline=False, the right-hand side is compiled from
+        get_algebraic_equations(), while the Jacobian, if any, is still derived
+        from the fully inlined state equations.
+
+        Requires numpy and a C compiler.
+        """
+        from bondgraph.cbackend import compile_c
+
+        entries = None
+        if jacobian:
+            state_equations = self.get_state_equations()
+            entries = _sparse_jacobian(state_equations, list(state_equations.keys()))
+        assignments = None
+        if inline:
+            state_equations = self.get_state_equations()
+        else:
+            state_equations, assignments = self._algebraic_state_equations()
+        return compile_c(
+            state_equations,
+            sorted(self.get_parameters(), key=str),
+            time,
+            entries,
+            cc,
+            build_dir=build_dir,
+            assignments=assignments,
+        )
+
+    def stepper(
+        self,
+        time: Symbol | None = None,
+        cc: str | None = None,
+        build_dir: str | None = None,
+        measure: bool = True,
+    ):
+        """
+        Compile the state equations into a bondgraph.realtime.Stepper, stepping
+        the states in place without allocating. The symbols of the effort and
+        flow sources that are not bound to values are its inputs.
+
+        Requires numpy and a C compiler.
+        """
+        from bondgraph.elements import Source_effort, Source_flow
+        from bondgraph.realtime import Stepper
+
+        parameters = self.get_parameters()
+        inputs = [
+            element.symbol
+            for element in self._elements
+            if isinstance(element, (Source_effort, Source_flow))
+            and element.symbol in parameters
+        ]
+        return Stepper(
+            self.get_state_equations(),
+            sorted(parameters, key=str),
+            list(dict.fromkeys(inputs)),
+            time,
+            cc,
+            build_dir=build_dir,
+            measure=measure,
+        )
+
+    def export_python(
+        self,
+        path: str | None = None,
+        time: Symbol | None = None,
+        inline: bool = True,
+    ) -> str:
+        """
+        Generate a standalone Python module evaluating the state equations with
+        NumPy, with common subexpressions computed once per evaluation, see
+        bondgraph.codegen.generate_python_module. States and parameters are
+        ordered as for compile_rhs(), and inline=False exports the equations
+        from get_algebraic_equations(). The source is written to path, if
+        given, and returned.
+        """
+        from bondgraph.codegen import generate_python_module
+
+        assignments = None
+        if inline:
+            state_equations = self.get_state_equations()
+        else:
+            state_equations, assignments = self._algebraic_state_equations()
+        source = generate_python_module(
+            state_equations,
+            sorted(self.get_parameters(), key=str),
+            time,
+            assignments,
+        )
+        if path is not None:
+            with open(path, "w") as file:
+                file.write(source)
+        return source
+
+    def to_state_space(
+        self,
+        outputs: List[Symbol] | None = None,
+        values: Dict[Symbol, float] | None = None,
+        sparse: bool | None = None,
+    ):
+        """
+        Extract the linear state-space model (A, B, C, D) of a graph containing
+        only linear elements, see bondgraph.linear.to_state_space.
+        """
+        from bondgraph.linear import to_state_space
+
+        return to_state_space(self, outputs, values, sparse)
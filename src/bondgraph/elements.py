@@ -6,6 +6,8 @@ import logging
 
 
 class OnePortElement(Node):
+    __slots__ = ("bond",)
+
     def __init__(self, name: str):
         super().__init__(name)
         self.bond: Bond | None = None
@@ -31,6 +33,8 @@ class OnePortElement(Node):
 
 
 class TwoPortElement(Node):
+    __slots__ = ("bond_1", "bond_2")
+
     def __init__(self, name: str):
         super().__init__(name)
         self.bond_1: Bond | None = None
@@ -52,6 +56,8 @@ class TwoPortElement(Node):
 
 
 class Element_R(OnePortElement):
+    __slots__ = ("symbol",)
+
     def __init__(self, name: str, symbol: Symbol):
         super().__init__(name)
         self.symbol = symbol
@@ -60,9 +66,9 @@ class Element_R(OnePortElement):
         if self.bond is None:
             return []
         if self.bond.effort_in_at_to is True and self.bond.node_to == self:
-            return [Equality(flow, effort / self.symbol)]
+            return [Equality(flow, effort / self.symbol, evaluate=False)]
         else:
-            return [Equality(effort, self.symbol * flow)]
+            return [Equality(effort, self.symbol * flow, evaluate=False)]
 
     @staticmethod
     def causality_policy() -> Causality:
@@ -87,13 +93,15 @@ class Element_R(OnePortElement):
 
 
 class Element_C(OnePortElement, HasStateEquations):
+    __slots__ = ("_compliance", "_displacement")
+
     def __init__(self, name: str, compliance: Symbol, displacement: Symbol):
         super().__init__(name)
         self._compliance = compliance
         self._displacement = displacement
 
     def equations(self, effort: Symbol, flow: Symbol) -> List[Equality]:
-        return [Equality(effort, self._displacement / self._compliance)]
+        return [Equality(effort, self._displacement / self._compliance, evaluate=False)]
 
     def state_equations(
         self, effort: Symbol, flow: Symbol
@@ -130,13 +138,15 @@ class Element_C(OnePortElement, HasStateEquations):
 
 
 class Element_I(OnePortElement, HasStateEquations):
+    __slots__ = ("_inertia", "_momentum")
+
     def __init__(self, name: str, inertia: Symbol, momentum: Symbol):
         super().__init__(name)
         self._inertia = inertia
         self._momentum = momentum
 
     def equations(self, effort: Symbol, flow: Symbol) -> List[Equality]:
-        return [Equality(flow, self._momentum / self._inertia)]
+        return [Equality(flow, self._momentum / self._inertia, evaluate=False)]
 
     def state_equations(
         self, effort: Symbol, flow: Symbol
@@ -173,12 +183,14 @@ class Element_I(OnePortElement, HasStateEquations):
 
 
 class Source_effort(OnePortElement):
+    __slots__ = ("symbol",)
+
     def __init__(self, name: str, symbol: Symbol):
         super().__init__(name)
         self.symbol = symbol
 
     def equations(self, effort: Symbol, flow: Symbol) -> List[Equality]:
-        return [Equality(effort, self.symbol)]
+        return [Equality(effort, self.symbol, evaluate=False)]
 
     @staticmethod
     def causality_policy():
@@ -210,12 +222,14 @@ class Source_effort(OnePortElement):
 
 
 class Source_flow(OnePortElement):
+    __slots__ = ("symbol",)
+
     def __init__(self, name: str, symbol: Symbol):
         super().__init__(name)
         self.symbol = symbol
 
     def equations(self, effort: Symbol, flow: Symbol) -> List[Equality]:
-        return [Equality(flow, self.symbol)]
+        return [Equality(flow, self.symbol, evaluate=False)]
 
     @staticmethod
     def causality_policy():
@@ -247,6 +261,8 @@ class Source_flow(OnePortElement):
 
 
 class Transformer(TwoPortElement):
+    __slots__ = ("ratio",)
+
     def __init__(self, name: str, ratio: Symbol):
         super().__init__(name)
         self.ratio = ratio
@@ -262,13 +278,13 @@ class Transformer(TwoPortElement):
             raise Exception("Transformer is not fully connected")
         if self.bond_1.effort_in_at_to:
             return [
-                Equality(flow_1, flow_2 / self.ratio),
-                Equality(effort_2, effort_1 / self.ratio),
+                Equality(flow_1, flow_2 / self.ratio, evaluate=False),
+                Equality(effort_2, effort_1 / self.ratio, evaluate=False),
             ]
         elif not self.bond_1.effort_in_at_to:
             return [
-                Equality(flow_2, flow_1 * self.ratio),
-                Equality(effort_1, effort_2 * self.ratio),
+                Equality(flow_2, flow_1 * self.ratio, evaluate=False),
+                Equality(effort_1, effort_2 * self.ratio, evaluate=False),
             ]
         else:
             raise Exception(f"Invalid causality at transformer {self.name}")
@@ -302,6 +318,8 @@ class Transformer(TwoPortElement):
 
 
 class Gyrator(TwoPortElement):
+    __slots__ = ("ratio",)
+
     def __init__(self, name: str, ratio: Symbol):
         super().__init__(name)
         self.ratio = ratio
@@ -318,13 +336,13 @@ class Gyrator(TwoPortElement):
 
         if self.bond_1.effort_in_at_to:
             return [
-                Equality(flow_1, effort_2 / self.ratio),
-                Equality(flow_2, effort_1 / self.ratio),
+                Equality(flow_1, effort_2 / self.ratio, evaluate=False),
+                Equality(flow_2, effort_1 / self.ratio, evaluate=False),
             ]
         elif not self.bond_1.effort_in_at_to:
             return [
-                Equality(effort_2, flow_1 * self.ratio),
-                Equality(effort_1, flow_2 * self.ratio),
+                Equality(effort_2, flow_1 * self.ratio, evaluate=False),
+                Equality(effort_1, flow_2 * self.ratio, evaluate=False),
             ]
 
     def assign_constraint_causality(self):
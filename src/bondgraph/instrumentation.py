@@ -0,0 +1,71 @@
+import time
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Dict, Iterable, Iterator
+
+from sympy import Expr, count_ops
+
+
+class DerivationStats:
+    """
+    Profile of deriving the state equations of a graph, filled in when passed
+    to BondGraph.get_state_equations() or BondGraph.assign_causalities().
+
+    Records the wall time of each phase, iteration counts of the causality
+    worklist and of the equation resolution, the number of xreplace calls in
+    each phase and, if count_ops is set, the total number of operations in the
+    expressions of each phase before and after substitution. Nothing is
+    recorded, and no time is spent on recording, when no stats are passed.
+    """
+
+    def __init__(self, count_ops: bool = True):
+        self.count_ops = count_ops
+        self.phase_times: Dict[str, float] = dict()
+        self.iterations: Dict[str, int] = dict()
+        self.xreplace_calls: Dict[str, int] = dict()
+        self.ops_before: Dict[str, int] = dict()
+        self.ops_after: Dict[str, int] = dict()
+        # "memory" or "disk" if the equations were not derived but cached
+        self.cache: str | None = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phase_times[name] = self.phase_times.get(name, 0.0) + elapsed
+
+    def count(self, name: str, amount: int = 1):
+        self.iterations[name] = self.iterations.get(name, 0) + amount
+
+    def count_xreplace(self, phase: str, amount: int = 1):
+        self.xreplace_calls[phase] = self.xreplace_calls.get(phase, 0) + amount
+
+    def record_sizes(self, phase: str, before: Iterable[Expr], after: Iterable[Expr]):
+        if not self.count_ops:
+            return
+        self.ops_before[phase] = sum(count_ops(expr) for expr in before)
+        self.ops_after[phase] = sum(count_ops(expr) for expr in after)
+
+    def total_time(self) -> float:
+        return sum(self.phase_times.values())
+
+    def __str__(self) -> str:
+        lines = []
+        if self.cache is not None:
+            lines.append(f"Equations from {self.cache} cache")
+        for phase, seconds in self.phase_times.items():
+            line = f"{phase}: {seconds * 1000:.3f} ms"
+            if phase in self.xreplace_calls:
+                line += f", {self.xreplace_calls[phase]} xreplace calls"
+            if phase in self.ops_before:
+                line += f", {self.ops_before[phase]} -> {self.ops_after[phase]} ops"
+            lines.append(line)
+        for name, iterations in self.iterations.items():
+            lines.append(f"{name}: {iterations} iterations")
+        return "\n".join(lines)
+
+
+def _phase(stats: DerivationStats | None, name: str) -> ContextManager:
+    return stats.phase(name) if stats is not None else nullcontext()
@@ -4,6 +4,8 @@ import logging
 
 
 class Junction(Node):
+    __slots__ = ("bonds",)
+
     def __init__(self, name: str):
         super().__init__(name)
         self.bonds: List[Bond] = []
@@ -20,6 +22,8 @@ class Junction(Node):
 
 
 class JunctionEqualEffort(Junction):
+    __slots__ = ("effort_in_bond",)
+
     def __init__(self, name: str):
         super().__init__(name)
         self.effort_in_bond: Bond | None = None
@@ -89,6 +93,8 @@ class JunctionEqualEffort(Junction):
 
 
 class JunctionEqualFlow(Junction):
+    __slots__ = ("effort_out_bond",)
+
     def __init__(self, name: str):
         super().__init__(name)
         self.effort_out_bond: Bond | None = None
@@ -0,0 +1,334 @@
+from typing import Dict, List, Sequence, Tuple
+
+from sympy import Expr, SparseMatrix, Symbol, sympify
+
+from bondgraph.common import NonlinearGraphError
+from bondgraph.core import BondGraph, _junction_identities, _topological_order
+from bondgraph.elements import (
+    Element_C,
+    Element_I,
+    Element_R,
+    Gyrator,
+    Source_effort,
+    Source_flow,
+    Transformer,
+)
+from bondgraph.junctions import JunctionEqualEffort, JunctionEqualFlow
+
+_LINEAR_NODE_TYPES = (
+    Element_R,
+    Element_C,
+    Element_I,
+    Source_effort,
+    Source_flow,
+    Transformer,
+    Gyrator,
+    JunctionEqualEffort,
+    JunctionEqualFlow,
+)
+
+# Sparse linear combination, mapping each variable to its coefficient
+LinearCombination = Dict[Symbol, Expr | float]
+
+# Numeric matrices of models with more states than this are sparse by default
+_DENSE_STATE_LIMIT = 1000
+
+
+class CooMatrix:
+    """
+    Numeric sparse matrix in coordinate format, holding the row index, column
+    index and value of each non-zero entry as NumPy arrays.
+    """
+
+    def __init__(self, rows, cols, data, shape: Tuple[int, int]):
+        self.rows = rows
+        self.cols = cols
+        self.data = data
+        self.shape = shape
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    def toarray(self):
+        import numpy as np
+
+        matrix = np.zeros(self.shape)
+        matrix[self.rows, self.cols] = self.data
+        return matrix
+
+    def tocsr(self):
+        """
+        Convert to a scipy.sparse CSR array. Requires scipy, from the sparse
+        extra.
+        """
+        from scipy.sparse import csr_array  # type: ignore
+
+        return csr_array((self.data, (self.rows, self.cols)), shape=self.shape)
+
+
+class StateSpace:
+    """
+    Linear state-space model dx/dt = A x + B u, y = C x + D u, where the
+    states x, inputs u and outputs y are ordered as in `states`, `inputs` and
+    `outputs`.
+    """
+
+    def __init__(
+        self,
+        A,
+        B,
+        C,
+        D,
+        states: List[Symbol],
+        inputs: List[Symbol],
+        outputs: List[Symbol],
+    ):
+        self.A = A
+        self.B = B
+        self.C = C
+        self.D = D
+        self.states = states
+        self.inputs = inputs
+        self.outputs = outputs
+
+
+class _LinearEquations:
+    """
+    The equations of a linear bond graph as sparse linear combinations, with
+    parameters either kept as symbols or replaced by their numeric values.
+    """
+
+    def __init__(
+        self,
+        identities: Dict[Symbol, Symbol],
+        values: Dict[Symbol, float] | None,
+        bound: Dict[Symbol, Expr],
+    ):
+        self.identities = identities
+        self.values = values
+        self.bound = bound
+        self.equations: Dict[Symbol, LinearCombination] = dict()
+        self.state_equations: Dict[Symbol, LinearCombination] = dict()
+
+    def coefficient(self, parameter: Symbol, inverse: bool = False):
+        parameter = sympify(self.bound.get(parameter, parameter))
+        if self.values is None:
+            return 1 / parameter if inverse else parameter
+        if parameter.is_number:
+            value = float(parameter)
+        elif parameter in self.values:
+            value = float(self.values[parameter])
+        else:
+            raise ValueError(f"Missing value for parameter {parameter}")
+        return 1.0 / value if inverse else value
+
+    def combination(self, *terms) -> LinearCombination:
+        combination: LinearCombination = dict()
+        for coefficient, symbol in terms:
+            symbol = self.identities.get(symbol, symbol)
+            combination[symbol] = combination.get(symbol, 0) + coefficient
+        return combination
+
+    def add(self, lhs: Symbol, *terms):
+        self.equations[lhs] = self.combination(*terms)
+
+
+def _formulate_linear_equations(
+    graph: BondGraph, values: Dict[Symbol, float] | None
+) -> _LinearEquations:
+    linear = _LinearEquations(
+        _junction_identities(graph._junctions), values, graph.get_bound_parameters()
+    )
+    for element in graph._elements:
+        bond = element.bond
+        if bond is None:
+            continue
+        e, f = bond.effort_symbol, bond.flow_symbol
+        if isinstance(element, Element_R):
+            if bond.effort_in_at_to is True and bond.node_to is element:
+                linear.add(f, (linear.coefficient(element.symbol, True), e))
+            else:
+                linear.add(e, (linear.coefficient(element.symbol), f))
+        elif isinstance(element, Element_C):
+            linear.add(
+                e,
+                (linear.coefficient(element._compliance, True), element._displacement),
+            )
+            linear.state_equations[element._displacement] = linear.combination((1, f))
+        elif isinstance(element, Element_I):
+            linear.add(
+                f, (linear.coefficient(element._inertia, True), element._momentum)
+            )
+            linear.state_equations[element._momentum] = linear.combination((1, e))
+        elif isinstance(element, Source_effort):
+            linear.add(e, (1, element.symbol))
+        elif isinstance(element, Source_flow):
+            linear.add(f, (1, element.symbol))
+
+    for two_port in graph._two_port_elements:
+        bond_1, bond_2 = two_port.bond_1, two_port.bond_2
+        if bond_1 is None or bond_2 is None:
+            continue
+        e_1, f_1 = bond_1.effort_symbol, bond_1.flow_symbol
+        e_2, f_2 = bond_2.effort_symbol, bond_2.flow_symbol
+        ratio = linear.coefficient(two_port.ratio)
+        inverse_ratio = linear.coefficient(two_port.ratio, True)
+        if isinstance(two_port, Transformer):
+            if bond_1.effort_in_at_to:
+                linear.add(f_1, (inverse_ratio, f_2))
+                linear.add(e_2, (inverse_ratio, e_1))
+            else:
+                linear.add(f_2, (ratio, f_1))
+                linear.add(e_1, (ratio, e_2))
+        elif isinstance(two_port, Gyrator):
+            if bond_1.effort_in_at_to:
+                linear.add(f_1, (inverse_ratio, e_2))
+                linear.add(f_2, (inverse_ratio, e_1))
+            else:
+                linear.add(e_2, (ratio, f_1))
+                linear.add(e_1, (ratio, f_2))
+
+    for junction in graph._junctions:
+        if isinstance(junction, JunctionEqualEffort):
+            dominant = junction.effort_in_bond
+        elif isinstance(junction, JunctionEqualFlow):
+            dominant = junction.effort_out_bond
+        else:
+            continue
+        if dominant is None:
+            continue
+        # Same sign conventions as the symbolic junction equations
+        sign = -1 if dominant.node_to is junction else 1
+        terms = []
+        for bond in junction.bonds:
+            if bond is dominant:
+                continue
+            direction = sign if bond.node_to is junction else -sign
+            if isinstance(junction, JunctionEqualEffort):
+                terms.append((direction, bond.flow_symbol))
+            else:
+                terms.append((direction, bond.effort_symbol))
+        if isinstance(junction, JunctionEqualEffort):
+            linear.add(dominant.flow_symbol, *terms)
+        else:
+            linear.add(dominant.effort_symbol, *terms)
+    return linear
+
+
+def _combine(
+    terms: LinearCombination, resolved: Dict[Symbol, LinearCombination]
+) -> LinearCombination:
+    result: LinearCombination = dict()
+    for variable, coefficient in terms.items():
+        expansion = resolved.get(variable)
+        if expansion is None:
+            result[variable] = result.get(variable, 0) + coefficient
+            continue
+        for base, base_coefficient in expansion.items():
+            result[base] = result.get(base, 0) + coefficient * base_coefficient
+    return {variable: c for variable, c in result.items() if c != 0}
+
+
+def _matrix(
+    rows: List[LinearCombination],
+    columns: List[Symbol],
+    numeric: bool,
+    sparse: bool,
+):
+    column_index = {symbol: index for index, symbol in enumerate(columns)}
+    entries = {
+        (i, column_index[symbol]): coefficient
+        for i, row in enumerate(rows)
+        for symbol, coefficient in row.items()
+        if symbol in column_index
+    }
+    shape = (len(rows), len(columns))
+    if not numeric:
+        return SparseMatrix(shape[0], shape[1], entries)
+    import numpy as np
+
+    coo = CooMatrix(
+        np.fromiter((i for i, _ in entries), dtype=np.intp, count=len(entries)),
+        np.fromiter((j for _, j in entries), dtype=np.intp, count=len(entries)),
+        np.fromiter(entries.values(), dtype=float, count=len(entries)),
+        shape,
+    )
+    return coo if sparse else coo.toarray()
+
+
+def to_state_space(
+    graph: BondGraph,
+    outputs: Sequence[Symbol] | None = None,
+    values: Dict[Symbol, float] | None = None,
+    sparse: bool | None = None,
+) -> StateSpace:
+    """
+    Build the linear state-space matrices of a bond graph directly from its
+    junction structure and the constitutive laws of its elements, propagating
+    sparse linear combinations in dependency order without forming symbolic
+    equations.
+
+    Inputs are the symbols of the sources and outputs are any state variables
+    or bond effort and flow symbols, defaulting to the state variables. The
+    matrices are sympy SparseMatrix objects, or NumPy arrays if values are
+    given for all other parameters. With sparse=True, numeric matrices are
+    returned as CooMatrix objects instead, which is the default for models
+    with more than 1000 states.
+
+    Raises NonlinearGraphError if the graph contains an element that is not
+    known to be linear, and ValueError if it has vector bonds.
+    """
+    for node in graph.get_nodes():
+        if type(node) not in _LINEAR_NODE_TYPES:
+            raise NonlinearGraphError(
+                f"Element {node} of type {type(node).__name__} is not known to be linear"
+            )
+
+    if any(bond.index is not None for bond in graph._bonds):
+        raise ValueError(
+            "State-space models of graphs with vector bonds are not supported"
+        )
+
+    graph.assign_causalities()
+    linear = _formulate_linear_equations(graph, values)
+
+    states = list(linear.state_equations.keys())
+    inputs = [
+        element.symbol
+        for element in graph._elements
+        if isinstance(element, (Source_effort, Source_flow))
+    ]
+    outputs = states if outputs is None else list(outputs)
+
+    dependencies = {
+        lhs: [symbol for symbol in rhs if symbol in linear.equations]
+        for lhs, rhs in linear.equations.items()
+    }
+    resolved: Dict[Symbol, LinearCombination] = dict()
+    for lhs in _topological_order(dependencies):
+        resolved[lhs] = _combine(linear.equations[lhs], resolved)
+
+    state_rows = [_combine(rhs, resolved) for rhs in linear.state_equations.values()]
+    output_rows = [
+        _combine(linear.combination((1, output)), resolved) for output in outputs
+    ]
+
+    known = set(states) | set(inputs)
+    for row in state_rows + output_rows:
+        unknown = [symbol for symbol in row if symbol not in known]
+        if unknown:
+            raise Exception(f"Unresolved variables in linear model: {unknown}")
+
+    numeric = values is not None
+    if sparse is None:
+        sparse = len(states) > _DENSE_STATE_LIMIT
+    return StateSpace(
+        _matrix(state_rows, states, numeric, sparse),
+        _matrix(state_rows, inputs, numeric, sparse),
+        _matrix(output_rows, states, numeric, sparse),
+        _matrix(output_rows, inputs, numeric, sparse),
+        states,
+        inputs,
+        outputs,
+    )
@@ -0,0 +1,327 @@
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+from sympy import Dummy, Expr, Idx, Indexed, Symbol, cse, lambdify, numbered_symbols
+
+
+def _batch_shape(x: np.ndarray, params: np.ndarray) -> tuple:
+    return np.broadcast_shapes(x.shape[1:], params.shape[1:])
+
+
+def _align(x: np.ndarray, params: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Give x and params the same number of dimensions, so that the rows of vector
+    states and parameters broadcast against each other's batch dimensions.
+    """
+    if x.ndim < params.ndim:
+        x = x.reshape(x.shape + (1,) * (params.ndim - x.ndim))
+    elif params.ndim < x.ndim:
+        params = params.reshape(params.shape + (1,) * (x.ndim - params.ndim))
+    return x, params
+
+
+def _channels(symbol: Symbol | Indexed) -> int:
+    if not isinstance(symbol, Indexed):
+        return 1
+    if len(symbol.indices) != 1:
+        raise ValueError(f"Vector symbol {symbol} must have exactly one index")
+    index = symbol.indices[0]
+    if not isinstance(index, Idx) or not index.upper.is_Integer:
+        raise ValueError(f"Index of vector symbol {symbol} needs a numeric range")
+    return int(index.upper - index.lower + 1)
+
+
+def _output_rows(outputs: Sequence[Expr]) -> Tuple[List[int | slice], int]:
+    """
+    Rows of each output in a stacked output array. Outputs containing vector
+    symbols take one row per channel.
+    """
+    rows: List[int | slice] = []
+    size = 0
+    for output in outputs:
+        indexed = [s for s in output.free_symbols if isinstance(s, Indexed)]
+        if indexed:
+            channels = _channels(indexed[0])
+            rows.append(slice(size, size + channels))
+        else:
+            channels = 1
+            rows.append(size)
+        size += channels
+    return rows, size
+
+
+class _Layout:
+    """
+    Rows occupied by each symbol in a stacked state or parameter array. Vector
+    symbols, indexed by an Idx, take one row per channel and are passed to the
+    compiled function as arrays.
+    """
+
+    def __init__(self, symbols: Sequence[Symbol]):
+        self.symbols: List[Symbol] = list(symbols)
+        self.rows: List[int | slice] = []
+        self.arguments: List[Symbol] = []
+        self.substitutions: Dict[Indexed, Symbol] = dict()
+        size = 0
+        for symbol in self.symbols:
+            channels = _channels(symbol)
+            if isinstance(symbol, Indexed):
+                argument = Dummy(str(symbol.base))
+                self.substitutions[symbol] = argument
+                self.rows.append(slice(size, size + channels))
+            else:
+                argument = symbol
+                self.rows.append(size)
+            self.arguments.append(argument)
+            size += channels
+        self.size = size
+
+    def split(self, array: np.ndarray) -> List[np.ndarray]:
+        return [array[rows] for rows in self.rows]
+
+    def check(self, array: np.ndarray, what: str):
+        if array.shape[0] != self.size:
+            raise ValueError(
+                f"Expected {self.size} {what}, got array of shape {array.shape}"
+            )
+
+
+def _lambdify(
+    time: Symbol,
+    states: _Layout,
+    parameters: _Layout,
+    expressions: Sequence[Expr],
+    assignments: Sequence[Tuple[Symbol, Expr]] | None = None,
+) -> Callable:
+    substitutions: Dict[Expr, Expr] = {
+        **states.substitutions,
+        **parameters.substitutions,
+    }
+    if not assignments:
+        return lambdify(
+            [time, *states.arguments, *parameters.arguments],
+            [expr.xreplace(substitutions) for expr in expressions],
+            modules="numpy",
+            cse=True,
+        )
+
+    # Named intermediate variables are evaluated in order ahead of the common
+    # subexpressions found in the remaining expressions
+    replacements: List[Tuple[Expr, Expr]] = []
+    for lhs, rhs in assignments:
+        name = Dummy(str(lhs.base) if isinstance(lhs, Indexed) else str(lhs))
+        replacements.append((name, rhs.xreplace(substitutions)))
+        substitutions[lhs] = name
+
+    def assignments_cse(exprs):
+        common, reduced = cse(exprs, symbols=numbered_symbols(cls=Dummy))
+        return replacements + common, reduced
+
+    return lambdify(
+        [time, *states.arguments, *parameters.arguments],
+        [expr.xreplace(substitutions) for expr in expressions],
+        modules="numpy",
+        cse=assignments_cse,
+    )
+
+
+class CompiledRHS:
+    """
+    Vectorized right-hand side of a system of state equations, callable as
+    f(t, x, params).
+
+    The rows of x follow the order of `states`, which is the order of the
+    state equations the function was compiled from. The rows of params follow
+    the order of `parameters`, which is sorted by symbol name unless given
+    explicitly. Vector states and parameters of a vector bond graph take one
+    row per channel, so x has `n_states` rows and params `n_parameters` rows.
+    Both x and params may have trailing batch dimensions, e.g. shape
+    (n_states, batch), to evaluate many operating points in one call.
+
+    Outputs compiled along with the state equations, keyed by the expressions
+    in `outputs`, are evaluated with the same arguments by observe().
+    """
+
+    def __init__(
+        self,
+        equations: Dict[Symbol, Expr],
+        parameters: Sequence[Symbol],
+        time: Symbol | None = None,
+        assignments: Sequence[Tuple[Symbol, Expr]] | None = None,
+        outputs: Dict[Expr, Expr] | None = None,
+    ):
+        self.states: List[Symbol] = list(equations.keys())
+        self.parameters: List[Symbol] = [p for p in parameters if p != time]
+        self.time = time if time is not None else Dummy("t")
+        self._states = _Layout(self.states)
+        self._parameters = _Layout(self.parameters)
+        self.n_states = self._states.size
+        self.n_parameters = self._parameters.size
+        self._function: Callable = _lambdify(
+            self.time,
+            self._states,
+            self._parameters,
+            list(equations.values()),
+            assignments,
+        )
+        outputs = outputs if outputs is not None else dict()
+        self.outputs: List[Expr] = list(outputs.keys())
+        self._output_rows, self.n_outputs = _output_rows(self.outputs)
+        self._output_function: Callable | None = None
+        if outputs:
+            self._output_function = _lambdify(
+                self.time,
+                self._states,
+                self._parameters,
+                list(outputs.values()),
+                assignments,
+            )
+
+    def _evaluate(
+        self, function: Callable, rows: List[int | slice], size: int, t, x, params, out
+    ) -> np.ndarray:
+        x = np.asarray(x, dtype=float)
+        params = np.asarray(params, dtype=float)
+        self._states.check(x, "states")
+        self._parameters.check(params, "parameters")
+        if out is None:
+            out = np.empty((size,) + _batch_shape(x, params))
+        x, params = _align(x, params)
+        values = function(t, *self._states.split(x), *self._parameters.split(params))
+        for row, value in zip(rows, values):
+            # Constant rows are broadcast over the batch
+            out[row] = value
+        return out
+
+    def __call__(self, t, x, params, out: np.ndarray | None = None) -> np.ndarray:
+        return self._evaluate(
+            self._function, self._states.rows, self.n_states, t, x, params, out
+        )
+
+    def observe(self, t, x, params, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Evaluate the outputs, with one row per output in the order of
+        `outputs` plus the batch dimensions of x and params.
+        """
+        if self._output_function is None:
+            return np.empty((0,) + _batch_shape(np.asarray(x), np.asarray(params)))
+        return self._evaluate(
+            self._output_function,
+            self._output_rows,
+            self.n_outputs,
+            t,
+            x,
+            params,
+            out,
+        )
+
+
+def compile_rhs(
+    equations: Dict[Symbol, Expr],
+    parameters: Sequence[Symbol],
+    time: Symbol | None = None,
+    assignments: Sequence[Tuple[Symbol, Expr]] | None = None,
+    outputs: Dict[Expr, Expr] | None = None,
+) -> CompiledRHS:
+    """
+    Compile state equations into a vectorized NumPy function f(t, x, params).
+    The time symbol, if any of the equations depend on time, is bound to t.
+    The equations may refer to intermediate variables defined by assignments,
+    a sequence of (variable, expression) pairs in evaluation order, which are
+    computed once per call. Outputs, keyed by any expression and given in
+    terms of states and parameters, are compiled for CompiledRHS.observe().
+    """
+    return CompiledRHS(equations, parameters, time, assignments, outputs)
+
+
+class CompiledJacobian:
+    """
+    Vectorized sparse Jacobian of a system of state equations, callable as
+    f(t, x, params) with the same argument layout as CompiledRHS.
+
+    Calling it returns the values of the structurally non-zero entries, with
+    shape (nnz,) plus any batch dimensions, at the positions given by the
+    `rows` and `cols` index arrays. Use dense() for the full matrix.
+    """
+
+    def __init__(
+        self,
+        states: Sequence[Symbol],
+        entries: Dict[Tuple[Symbol, Symbol], Expr],
+        parameters: Sequence[Symbol],
+        time: Symbol | None = None,
+    ):
+        self.states: List[Symbol] = list(states)
+        self.parameters: List[Symbol] = [p for p in parameters if p != time]
+        self.time = time if time is not None else Dummy("t")
+        self._states = _Layout(self.states)
+        self._parameters = _Layout(self.parameters)
+        self.n_states = self._states.size
+
+        state_rows = dict(zip(self.states, self._states.rows))
+        indices = np.arange(self.n_states)
+        rows: List[np.ndarray] = []
+        cols: List[np.ndarray] = []
+        # Entries between vector states couple equal channels only
+        self._entry_rows: List[slice] = []
+        start = 0
+        for row, col in entries:
+            row_indices = np.atleast_1d(indices[state_rows[row]])
+            col_indices = np.atleast_1d(indices[state_rows[col]])
+            if len(row_indices) != len(col_indices):
+                raise ValueError(
+                    f"Jacobian entry between {row} and {col} couples vector "
+                    + "and scalar states"
+                )
+            self._entry_rows.append(slice(start, start + len(row_indices)))
+            start += len(row_indices)
+            rows.append(row_indices)
+            cols.append(col_indices)
+        self.rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.intp)
+        self.cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.intp)
+        self._function: Callable = _lambdify(
+            self.time, self._states, self._parameters, list(entries.values())
+        )
+
+    @property
+    def nnz(self) -> int:
+        return len(self.rows)
+
+    def __call__(self, t, x, params, out: np.ndarray | None = None) -> np.ndarray:
+        x = np.asarray(x, dtype=float)
+        params = np.asarray(params, dtype=float)
+        self._states.check(x, "states")
+        self._parameters.check(params, "parameters")
+        if out is None:
+            out = np.empty((self.nnz,) + _batch_shape(x, params))
+        if self.nnz:
+            x, params = _align(x, params)
+            values = self._function(
+                t, *self._states.split(x), *self._parameters.split(params)
+            )
+            for rows, value in zip(self._entry_rows, values):
+                out[rows] = value
+        return out
+
+    def dense(self, t, x, params) -> np.ndarray:
+        """
+        Evaluate the Jacobian as a dense array of shape (n_states, n_states)
+        plus any batch dimensions.
+        """
+        values = self(t, x, params)
+        jacobian = np.zeros((self.n_states, self.n_states) + values.shape[1:])
+        jacobian[self.rows, self.cols] = values
+        return jacobian
+
+
+def compile_jacobian(
+    states: Sequence[Symbol],
+    entries: Dict[Tuple[Symbol, Symbol], Expr],
+    parameters: Sequence[Symbol],
+    time: Symbol | None = None,
+) -> CompiledJacobian:
+    """
+    Compile the sparse Jacobian entries, keyed by (state, state), into a
+    vectorized NumPy function f(t, x, params).
+    """
+    return CompiledJacobian(states, entries, parameters, time)
@@ -0,0 +1,195 @@
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+from sympy import Expr, Symbol
+
+from bondgraph.common import Bond
+from bondgraph.core import (
+    BondGraph,
+    _Derivation,
+    _resolve_equations,
+    _substitute_state_equations,
+)
+
+# Equations and state equations of an independent part of a graph
+_EquationGroup = Tuple[Dict[Symbol, Expr], Dict[Symbol, Expr]]
+
+# Groups to resolve, inherited by forked workers instead of being pickled
+_inherited_groups: List[_EquationGroup] = []
+
+
+def connected_components(graph: BondGraph) -> List[List[Bond]]:
+    """
+    Split a graph into its connected components, each given as its bonds in
+    the order they were added to the graph.
+    """
+    return [
+        [graph._bonds[bond_id] for bond_id in component]
+        for component in graph.get_topology().components()
+    ]
+
+
+def _equation_groups(graph: BondGraph, derivation: _Derivation) -> List[_EquationGroup]:
+    """
+    Partition the formulated equations by the connected component of the bond
+    each one is about. Components whose equations refer to each other, such as
+    through ports of the same submodel instance, are merged.
+    """
+    components = graph.get_topology().components()
+    parent = list(range(len(components)))
+
+    def find(k: int) -> int:
+        while parent[k] != k:
+            parent[k] = parent[parent[k]]
+            k = parent[k]
+        return k
+
+    owner: Dict[Symbol, int] = dict()
+    for k, component in enumerate(components):
+        for bond_id in component:
+            bond = graph._bonds[bond_id]
+            owner[bond.effort_symbol] = k  # type: ignore
+            owner[bond.flow_symbol] = k  # type: ignore
+
+    def group_of(rhs: Expr, default: int) -> int:
+        group = find(default)
+        for symbol in rhs.free_symbols:
+            other = owner.get(symbol)  # type: ignore
+            if other is not None and find(other) != group:
+                parent[find(other)] = group
+        return group
+
+    state_owner: Dict[Symbol, int] = dict()
+    for lhs, rhs in derivation.equations.items():
+        group_of(rhs, owner.get(lhs, 0))
+    for var, rhs in derivation.state_equations.items():
+        free_symbols = [s for s in rhs.free_symbols if s in owner]
+        state_owner[var] = group_of(rhs, owner[free_symbols[0]] if free_symbols else 0)
+
+    groups: Dict[int, _EquationGroup] = dict()
+    for lhs, rhs in derivation.equations.items():
+        groups.setdefault(find(owner.get(lhs, 0)), (dict(), dict()))[0][lhs] = rhs
+    for var, rhs in derivation.state_equations.items():
+        groups.setdefault(find(state_owner[var]), (dict(), dict()))[1][var] = rhs
+    return list(groups.values())
+
+
+def _resolve_groups(
+    groups: List[_EquationGroup],
+) -> List[Tuple[Dict[Symbol, Expr], Dict[Symbol, Expr]]]:
+    """
+    Resolve the equations of each group and substitute them into its state
+    equations, returning the resolved equations and state equations.
+    """
+    results = []
+    for equations, state_equations in groups:
+        derivation = _Derivation()
+        derivation.equations = equations
+        derivation.state_equations = state_equations
+        derivation.resolved = _resolve_equations(equations)
+        results.append(
+            (derivation.resolved, _substitute_state_equations(derivation, None, None))
+        )
+    return results
+
+
+def _resolve_inherited_groups(
+    indices: List[int],
+) -> List[Tuple[Dict[Symbol, Expr], Dict[Symbol, Expr]]]:
+    return _resolve_groups([_inherited_groups[k] for k in indices])
+
+
+def _balance(groups: List[_EquationGroup], num_chunks: int) -> List[List[int]]:
+    """
+    Distribute groups over chunks with similar numbers of equations, largest
+    first, returning the group indices of each non-empty chunk.
+    """
+
+    def size(k: int) -> int:
+        return len(groups[k][0]) + len(groups[k][1])
+
+    chunks: List[List[int]] = [[] for _ in range(num_chunks)]
+    sizes = [0] * num_chunks
+    for index in sorted(range(len(groups)), key=lambda k: -size(k)):
+        smallest = sizes.index(min(sizes))
+        chunks[smallest].append(index)
+        sizes[smallest] += size(index)
+    return [chunk for chunk in chunks if chunk]
+
+
+def get_state_equations_parallel(
+    graph: BondGraph,
+    max_workers: int | None = None,
+    executor: Executor | None = None,
+) -> Dict[Symbol, Expr]:
+    """
+    Derive the state equations of a graph with the substitution work for each
+    of its connected components done in parallel worker processes. The result
+    equals that of graph.get_state_equations(), in the same order, and is
+    cached by the graph in the same way.
+
+    Causalities and the equations of each node are formulated in the calling
+    process, so only SymPy expressions are sent to the workers. Uses a process
+    pool with max_workers processes, defaulting to the number of CPUs
+    available, unless an executor is given. Graphs with a single component are
+    derived in the calling process.
+    """
+    cached = graph._cached_state_equations()
+    if cached is not None:
+        return cached
+
+    if max_workers is None:
+        if hasattr(os, "sched_getaffinity"):
+            max_workers = len(os.sched_getaffinity(0))
+        else:
+            max_workers = os.cpu_count() or 1
+    if graph.get_topology().num_bonds == 0 or (max_workers <= 1 and executor is None):
+        return graph.get_state_equations()
+
+    derivation = graph._formulate_equations()
+    groups = _equation_groups(graph, derivation)
+    if len(groups) <= 1:
+        return graph.get_state_equations()
+
+    global _inherited_groups
+    chunks = _balance(groups, max_workers)
+    owns_executor = executor is None
+    inherit = owns_executor and "fork" in multiprocessing.get_all_start_methods()
+    if executor is None:
+        executor = ProcessPoolExecutor(
+            max_workers=len(chunks),
+            mp_context=multiprocessing.get_context("fork") if inherit else None,
+        )
+    try:
+        if inherit:
+            # Unpickling SymPy expressions is costly, so let forked workers
+            # inherit the equations and only send their indices
+            _inherited_groups = groups
+            futures = [
+                executor.submit(_resolve_inherited_groups, chunk) for chunk in chunks
+            ]
+        else:
+            futures = [
+                executor.submit(_resolve_groups, [groups[k] for k in chunk])
+                for chunk in chunks
+            ]
+        diff_eq_sys: Dict[Symbol, Expr] = dict()
+        for future in futures:
+            for resolved, state_equations in future.result():
+                derivation.resolved.update(resolved)
+                diff_eq_sys.update(state_equations)
+    finally:
+        _inherited_groups = []
+        if owns_executor:
+            executor.shutdown()
+
+    # Follow the element order of the whole graph
+    derivation.diff_eq_sys = {
+        var: diff_eq_sys[var]
+        for var in derivation.state_equations
+        if var in diff_eq_sys
+    }
+    graph._store_derivation(derivation)
+    return dict(derivation.diff_eq_sys)
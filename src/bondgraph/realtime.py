@@ -0,0 +1,170 @@
+import ctypes
+import time as _time
+from typing import Dict, List, NamedTuple, Sequence
+
+import numpy as np
+from sympy import Expr, Symbol
+
+from bondgraph.cbackend import _build_library, generate_c_source
+from bondgraph.numeric import _Layout
+
+
+class LatencyStats(NamedTuple):
+    """
+    Wall-clock latency of the steps taken so far, in seconds. The percentile
+    is taken over the most recent steps kept in the stepper's history.
+    """
+
+    steps: int
+    mean: float
+    worst: float
+    p99: float
+
+
+def _step_source(n_states: int) -> List[str]:
+    """
+    C source of one classic Runge-Kutta step of the right-hand side, updating
+    the time and states in place and using scratch space for five vectors.
+    """
+    n = n_states
+    return [
+        "void bg_step(double dt, double *t, double *x, const double *p,"
+        + " double *scratch)",
+        "{",
+        f"    double *k1 = scratch, *k2 = scratch + {n}, *k3 = scratch + {2 * n};",
+        f"    double *k4 = scratch + {3 * n}, *xs = scratch + {4 * n};",
+        "    const double t0 = *t;",
+        "    bg_rhs_strided(t0, x, 1, p, 1, k1, 1);",
+        f"    for (long i = 0; i < {n}; i++) xs[i] = x[i] + 0.5 * dt * k1[i];",
+        "    bg_rhs_strided(t0 + 0.5 * dt, xs, 1, p, 1, k2, 1);",
+        f"    for (long i = 0; i < {n}; i++) xs[i] = x[i] + 0.5 * dt * k2[i];",
+        "    bg_rhs_strided(t0 + 0.5 * dt, xs, 1, p, 1, k3, 1);",
+        f"    for (long i = 0; i < {n}; i++) xs[i] = x[i] + dt * k3[i];",
+        "    bg_rhs_strided(t0 + dt, xs, 1, p, 1, k4, 1);",
+        f"    for (long i = 0; i < {n}; i++)",
+        "        x[i] += dt / 6.0 * (k1[i] + 2.0 * k2[i] + 2.0 * k3[i] + k4[i]);",
+        "    *t = t0 + dt;",
+        "}",
+    ]
+
+
+class Stepper:
+    """
+    Fixed-step integrator of state equations compiled to native code, for
+    stepping a model in real time. The time, states, parameters and scratch
+    space are allocated once, and step() advances them in place with one
+    call into the library, so that stepping allocates no arrays.
+
+    Parameters are ordered with the `inputs` first, followed by the other
+    parameters sorted by name. The input rows are available as the writable
+    view `input_values`, which can be assigned between steps, and `x` and
+    `params` are the state and parameter buffers themselves.
+
+    Unless measure is False, the latency of each step is recorded, keeping
+    the most recent `history` steps for the percentile in latency().
+    """
+
+    def __init__(
+        self,
+        equations: Dict[Symbol, Expr],
+        parameters: Sequence[Symbol],
+        inputs: Sequence[Symbol] = (),
+        time: Symbol | None = None,
+        cc: str | None = None,
+        flags: Sequence[str] = ("-O2",),
+        build_dir: str | None = None,
+        measure: bool = True,
+        history: int = 10000,
+    ):
+        self.states: List[Symbol] = list(equations.keys())
+        self.inputs: List[Symbol] = [u for u in inputs if u != time]
+        others = [p for p in parameters if p != time and p not in self.inputs]
+        self.parameters: List[Symbol] = self.inputs + sorted(others, key=str)
+        states = _Layout(self.states)
+        parameter_layout = _Layout(self.parameters)
+        self.n_states = states.size
+        self.n_parameters = parameter_layout.size
+        self._parameter_rows = dict(zip(self.parameters, parameter_layout.rows))
+
+        source, _positions = generate_c_source(equations, self.parameters, time)
+        self.source = source + "\n" + "\n".join(_step_source(self.n_states)) + "\n"
+        self.library = _build_library(self.source, cc, list(flags), build_dir)
+
+        self._time = np.zeros(1)
+        self.x = np.zeros(self.n_states)
+        self.params = np.zeros(self.n_parameters)
+        self.input_values = self.params[: _Layout(self.inputs).size]
+        self._scratch = np.zeros(5 * max(self.n_states, 1))
+
+        self._step = self.library.bg_step
+        self._step.argtypes = [ctypes.c_double] + [ctypes.c_void_p] * 4
+        self._step.restype = None
+        # Addresses are fixed as long as the buffers live
+        self._arguments = tuple(
+            ctypes.c_void_p(buffer.ctypes.data)
+            for buffer in (self._time, self.x, self.params, self._scratch)
+        )
+
+        self.measure = measure
+        self._latencies = np.zeros(max(history, 1), dtype=np.int64)
+        self._steps = 0
+        self._total_ns = 0
+        self._worst_ns = 0
+
+    @property
+    def t(self) -> float:
+        return float(self._time[0])
+
+    def reset(self, t: float = 0.0, x0=None):
+        """
+        Set the time and, if given, the states, and clear the latency record.
+        """
+        self._time[0] = t
+        if x0 is not None:
+            self.x[:] = x0
+        self._steps = 0
+        self._total_ns = 0
+        self._worst_ns = 0
+
+    def set_parameter(self, symbol: Symbol, value):
+        """
+        Set the value, or the values of all channels, of a parameter or input.
+        """
+        self.params[self._parameter_rows[symbol]] = value
+
+    def step(self, dt: float, inputs=None):
+        """
+        Advance the states by one Runge-Kutta step of size dt. Inputs, if
+        given, are copied into `input_values` first, one value at a time
+        unless they are an ndarray, so that a list or tuple of floats does not
+        allocate a temporary array.
+        """
+        if inputs is not None:
+            values = self.input_values
+            if isinstance(inputs, np.ndarray):
+                np.copyto(values, inputs)
+            else:
+                for k in range(len(values)):
+                    values[k] = inputs[k]
+        if not self.measure:
+            self._step(dt, *self._arguments)
+            return
+        start = _time.perf_counter_ns()
+        self._step(dt, *self._arguments)
+        elapsed = _time.perf_counter_ns() - start
+        self._latencies[self._steps % len(self._latencies)] = elapsed
+        self._steps += 1
+        self._total_ns += elapsed
+        if elapsed > self._worst_ns:
+            self._worst_ns = elapsed
+
+    def latency(self) -> LatencyStats:
+        if self._steps == 0:
+            return LatencyStats(0, 0.0, 0.0, 0.0)
+        recent = self._latencies[: min(self._steps, len(self._latencies))]
+        return LatencyStats(
+            self._steps,
+            self._total_ns / self._steps * 1e-9,
+            self._worst_ns * 1e-9,
+            float(np.percentile(recent, 99)) * 1e-9,
+        )
@@ -0,0 +1,250 @@
+from typing import List
+
+import numpy as np
+from sympy import Symbol
+
+from bondgraph.core import BondGraph
+from bondgraph.numeric import CompiledRHS
+from bondgraph.trajectory import Trajectory, TrajectoryWriter
+
+# Dormand-Prince 5(4) tableau
+_DOPRI_C = np.array([0.0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1.0, 1.0])
+_DOPRI_A = [
+    [],
+    [1 / 5],
+    [3 / 40, 9 / 40],
+    [44 / 45, -56 / 15, 32 / 9],
+    [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+    [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+    [35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84],
+]
+# Difference between the 5th and 4th order solution weights
+_DOPRI_E = [
+    71 / 57600,
+    0.0,
+    -71 / 16695,
+    71 / 1920,
+    -17253 / 339200,
+    22 / 525,
+    -1 / 40,
+]
+
+
+class SimulationResult:
+    """
+    Trajectories of a batch of simulations. `x` has shape
+    (len(t), n_states, batch), with states in the order of `states`, and `y`
+    has shape (len(t), n_outputs, batch) if the right-hand side has outputs,
+    or is None otherwise. The arrays of a simulation written to a file are
+    mapped from the file.
+    """
+
+    def __init__(
+        self,
+        t: np.ndarray,
+        x: np.ndarray,
+        states: List[Symbol],
+        parameters: List[Symbol],
+        y: np.ndarray | None = None,
+        outputs: List | None = None,
+    ):
+        self.t = t
+        self.x = x
+        self.y = y
+        self.states = states
+        self.parameters = parameters
+        self.outputs = outputs if outputs is not None else []
+        self.num_steps = 0
+
+
+def _rk4_interval(
+    rhs: CompiledRHS, t: float, t_end: float, x: np.ndarray, params, dt: float
+) -> int:
+    steps = max(int(np.ceil((t_end - t) / dt - 1e-9)), 1)
+    h = (t_end - t) / steps
+    for _ in range(steps):
+        k1 = rhs(t, x, params)
+        k2 = rhs(t + h / 2, x + h / 2 * k1, params)
+        k3 = rhs(t + h / 2, x + h / 2 * k2, params)
+        k4 = rhs(t + h, x + h * k3, params)
+        x += h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+        t = t + h
+    return steps
+
+
+def _dopri_interval(
+    rhs: CompiledRHS,
+    t: float,
+    t_end: float,
+    x: np.ndarray,
+    params,
+    h: float,
+    k_first: np.ndarray,
+    rtol: float,
+    atol: float,
+    max_steps: int,
+):
+    steps = 0
+    k: List[np.ndarray] = [k_first] * 7
+    while t < t_end:
+        if steps >= max_steps:
+            raise RuntimeError(f"Maximum number of steps exceeded at t={t}")
+        # Shorten the step to end exactly at the next output time
+        h_step = min(h, t_end - t)
+        for stage in range(1, 7):
+            x_stage = x.copy()
+            for weight, k_previous in zip(_DOPRI_A[stage], k):
+                if weight != 0.0:
+                    x_stage += h_step * weight * k_previous
+            k[stage] = rhs(t + _DOPRI_C[stage] * h_step, x_stage, params)
+        error = np.zeros_like(x)
+        for weight, k_stage in zip(_DOPRI_E, k):
+            if weight != 0.0:
+                error += h_step * weight * k_stage
+        # x_stage of the last stage is the 5th order solution
+        scale = atol + rtol * np.maximum(np.abs(x), np.abs(x_stage))
+        # The whole batch shares step size, controlled by its worst trajectory
+        norm = 0.0
+        if x.size:
+            norm = float(np.max(np.sqrt(np.mean((error / scale) ** 2, axis=0))))
+        factor = 5.0 if norm == 0.0 else min(5.0, max(0.2, 0.9 * norm**-0.2))
+        if norm <= 1.0:
+            t = t_end if h_step >= t_end - t else t + h_step
+            x[...] = x_stage
+            # First same as last
+            k[0] = k[6]
+            steps += 1
+            h = max(h, h_step * factor) if h_step < h else h_step * factor
+        else:
+            h = h_step * factor
+    return h, k[0], steps
+
+
+def simulate(
+    model: BondGraph | CompiledRHS,
+    x0,
+    params,
+    t_eval,
+    method: str = "rk4",
+    dt: float | None = None,
+    rtol: float = 1e-6,
+    atol: float = 1e-9,
+    max_steps: int = 1000000,
+    output: str | TrajectoryWriter | None = None,
+    decimation: int = 1,
+) -> SimulationResult:
+    """
+    Integrate a batch of simulations of the state equations together. The
+    model is a graph, compiled with compile_rhs(), or a compiled right-hand
+    side such as CompiledRHS or bondgraph.cbackend.CompiledC.
+
+    x0 has shape (n_states,) or (n_states, batch) and params (n_params,) or
+    (n_params, batch), ordered as the `states` and `parameters` of the compiled
+    right-hand side. The trajectories are stored at the times in t_eval, whose
+    first item is the initial time.
+
+    Methods are "rk4", fixed-step Runge-Kutta with step size dt (defaulting to
+    the spacing of t_eval), and "dopri5", adaptive Dormand-Prince with error
+    tolerances rtol and atol and a step size shared by the whole batch.
+
+    Only every `decimation`-th time of t_eval is stored, along with the
+    outputs of a right-hand side compiled with outputs. If output is a path
+    or a TrajectoryWriter, the trajectories are streamed to that file rather
+    than kept in memory, and the result maps them from the file.
+    """
+    rhs = model.compile_rhs() if isinstance(model, BondGraph) else model
+
+    t_eval = np.asarray(t_eval, dtype=float)
+    params = np.asarray(params, dtype=float)
+    x0 = np.asarray(x0, dtype=float)
+    if x0.shape[0] != rhs.n_states:
+        raise ValueError(
+            f"Expected {rhs.n_states} initial states, got shape {x0.shape}"
+        )
+    if t_eval.ndim != 1 or len(t_eval) == 0 or np.any(np.diff(t_eval) < 0):
+        raise ValueError("t_eval must be a non-empty, increasing sequence of times")
+
+    batch_shape = np.broadcast_shapes(x0.shape[1:], params.shape[1:])
+    x = np.array(np.broadcast_to(x0, x0.shape[:1] + batch_shape))
+    outputs = list(getattr(rhs, "outputs", []))
+    if decimation < 1:
+        raise ValueError("Decimation must be a positive integer")
+    num_rows = -(-len(t_eval) // decimation)
+    writer = output
+    if isinstance(output, str):
+        writer = TrajectoryWriter(
+            output,
+            rhs.states,
+            num_rows,
+            outputs,
+            batch_shape,
+            decimation,
+            metadata={"parameters": [str(p) for p in rhs.parameters]},
+        )
+    if writer is not None and writer.dtype["x"].shape != x.shape:
+        raise ValueError(
+            f"Trajectory rows of shape {writer.dtype['x'].shape} do not match "
+            + f"states of shape {x.shape}"
+        )
+    trajectory = y = None
+    if writer is None:
+        trajectory = np.empty((num_rows,) + x.shape)
+        if outputs:
+            y = np.empty((num_rows, rhs.n_outputs) + batch_shape)
+
+    def record(index: int):
+        if writer is not None:
+            # Outputs are only evaluated for rows the decimation keeps
+            observed = None
+            if outputs and writer.due():
+                observed = rhs.observe(t_eval[index], x, params)
+            writer.append(t_eval[index], x, observed)
+        elif index % decimation == 0:
+            trajectory[index // decimation] = x
+            if y is not None:
+                rhs.observe(t_eval[index], x, params, out=y[index // decimation])
+
+    result = SimulationResult(
+        t_eval[::decimation], trajectory, rhs.states, rhs.parameters, y, outputs
+    )
+    record(0)
+
+    if method == "rk4":
+        if dt is None:
+            dt = float(np.min(np.diff(t_eval))) if len(t_eval) > 1 else 1.0
+        for index in range(1, len(t_eval)):
+            if t_eval[index] > t_eval[index - 1]:
+                result.num_steps += _rk4_interval(
+                    rhs, t_eval[index - 1], t_eval[index], x, params, dt
+                )
+            record(index)
+    elif method == "dopri5":
+        h = dt if dt is not None else max((t_eval[-1] - t_eval[0]) * 1e-3, 1e-6)
+        k_first = rhs(t_eval[0], x, params)
+        for index in range(1, len(t_eval)):
+            h, k_first, steps = _dopri_interval(
+                rhs,
+                t_eval[index - 1],
+                t_eval[index],
+                x,
+                params,
+                h,
+                k_first,
+                rtol,
+                atol,
+                max_steps - result.num_steps,
+            )
+            result.num_steps += steps
+            record(index)
+    else:
+        raise ValueError(f"Unknown integration method {method}")
+
+    if writer is not None:
+        if writer is output:
+            writer.commit()
+        else:
+            writer.close()
+        stored = Trajectory(writer.path)
+        result.t, result.x = stored.t, stored.x
+        result.y = stored.y if outputs else None
+    return result
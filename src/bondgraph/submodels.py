@@ -0,0 +1,189 @@
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sympy import Equality, Expr, Symbol
+
+from bondgraph.common import Causality, HasStateEquations
+from bondgraph.core import BondGraph
+from bondgraph.elements import OnePortElement, Source_effort, Source_flow
+
+
+class Submodel:
+    """
+    A reusable component type, defined by a bond graph whose external ports are
+    source elements. A Source_effort port receives effort from the enclosing
+    graph and returns flow, a Source_flow port receives flow and returns effort.
+
+    The equations of the component are derived once, in terms of its internal
+    states, its parameters and the port variables, and shared by all of its
+    instances.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        graph: BondGraph,
+        ports: Dict[str, Source_effort | Source_flow],
+    ):
+        self.name = name
+        self.graph = graph
+        self.ports = ports
+        self._derived: Tuple[Dict[Symbol, Expr], Dict[str, Expr]] | None = None
+
+    def _port_symbols(self) -> Set[Symbol]:
+        return {port.symbol for port in self.ports.values()}
+
+    def derive(self) -> Tuple[Dict[Symbol, Expr], Dict[str, Expr]]:
+        """
+        Return the state equations of the component and the expression for the
+        output variable of each port, i.e. the flow at effort ports and the
+        effort at flow ports, deriving them on first use.
+        """
+        if self._derived is not None:
+            return self._derived
+
+        derivation = self.graph._resolved_derivation()
+        state_equations = dict(derivation.diff_eq_sys)
+        outputs: Dict[str, Expr] = dict()
+        for port_name, port in self.ports.items():
+            if port.bond is None:
+                raise Exception(f"Port {port_name} of {self.name} is not connected")
+            if isinstance(port, Source_effort):
+                output = port.bond.flow_symbol
+            else:
+                output = port.bond.effort_symbol
+            output = derivation.identities.get(output, output)  # type: ignore
+            if output not in derivation.resolved:
+                raise Exception(
+                    f"Output of port {port_name} of {self.name} is undefined"
+                )
+            outputs[port_name] = derivation.resolved[output]
+        self._derived = (state_equations, outputs)
+        return self._derived
+
+    def instantiate(
+        self, name: str, shared: Iterable[Symbol] = ()
+    ) -> "SubmodelInstance":
+        """
+        Create an instance of the component. Its states and parameters are
+        renamed by appending the instance name, except for the shared symbols,
+        which keep their names so that instances can share parameters.
+        """
+        return SubmodelInstance(self, name, set(shared))
+
+
+class SubmodelInstance:
+    def __init__(self, submodel: Submodel, name: str, shared: Set[Symbol]):
+        self.submodel = submodel
+        self.name = name
+
+        state_equations, outputs = submodel.derive()
+        port_symbols = submodel._port_symbols()
+        internal_symbols = set(state_equations.keys())
+        internal_symbols.update(submodel.graph.get_parameters())
+        for rhs in state_equations.values():
+            internal_symbols.update(rhs.free_symbols)
+        self.renaming: Dict[Symbol, Symbol] = {
+            symbol: Symbol(f"{symbol.name}_{name}", **symbol.assumptions0)
+            for symbol in internal_symbols
+            if symbol not in port_symbols and symbol not in shared
+        }
+
+        self.state_equations: Dict[Symbol, Expr] = {
+            self.renaming.get(var, var): rhs.xreplace(self.renaming)
+            for var, rhs in state_equations.items()
+        }
+        self.parameters: Set[Symbol] = {
+            self.renaming.get(symbol, symbol)
+            for symbol in submodel.graph.get_parameters()
+            if symbol not in port_symbols
+        }
+        self.ports: Dict[str, SubmodelPort] = {
+            port_name: SubmodelPort(
+                self,
+                port_name,
+                submodel.ports[port_name],
+                outputs[port_name].xreplace(self.renaming),
+                primary=(index == 0),
+            )
+            for index, port_name in enumerate(submodel.ports)
+        }
+
+    def port(self, name: str) -> "SubmodelPort":
+        return self.ports[name]
+
+    def _port_inputs(self) -> Dict[Symbol, Expr]:
+        """
+        Map the port symbols of the component to the variables of the bonds
+        connecting its ports in the enclosing graph.
+        """
+        inputs: Dict[Symbol, Expr] = dict()
+        for port in self.ports.values():
+            if port.bond is None:
+                raise Exception(f"Port {port.name} is not connected")
+            if isinstance(port.template, Source_effort):
+                inputs[port.template.symbol] = port.bond.effort_symbol  # type: ignore
+            else:
+                inputs[port.template.symbol] = port.sign() * port.bond.flow_symbol
+        return inputs
+
+
+class SubmodelPort(OnePortElement, HasStateEquations):
+    """
+    External port of a submodel instance, bonded to the enclosing graph like a
+    one-port element. The first port of each instance also carries the state
+    equations and parameters of the instance.
+    """
+
+    def __init__(
+        self,
+        instance: SubmodelInstance,
+        port_name: str,
+        template: Source_effort | Source_flow,
+        output: Expr,
+        primary: bool,
+    ):
+        super().__init__(f"{instance.name}.{port_name}")
+        self.instance = instance
+        self.template = template
+        self.output = output
+        self.primary = primary
+
+    def sign(self) -> int:
+        """
+        Flows are negated if the bond in the enclosing graph is oriented
+        opposite to the port bond inside the component.
+        """
+        if self.bond is None or self.template.bond is None:
+            return 1
+        into_template = self.template.bond.node_from is self.template
+        into_instance = self.bond.node_to is self
+        return 1 if into_template == into_instance else -1
+
+    def equations(self, effort: Symbol, flow: Symbol) -> List[Equality]:
+        output = self.output.xreplace(self.instance._port_inputs())
+        if isinstance(self.template, Source_effort):
+            return [Equality(flow, self.sign() * output, evaluate=False)]
+        else:
+            return [Equality(effort, output, evaluate=False)]
+
+    def state_equations(
+        self, effort: Symbol, flow: Symbol
+    ) -> List[Tuple[Symbol, Expr]]:
+        if not self.primary:
+            return []
+        inputs = self.instance._port_inputs()
+        return [
+            (var, rhs.xreplace(inputs))
+            for var, rhs in self.instance.state_equations.items()
+        ]
+
+    def causality_policy(self) -> Causality:  # type: ignore
+        if isinstance(self.template, Source_effort):
+            return Causality.FixedEffortIn
+        return Causality.FixedEffortOut
+
+    def parameter_symbols(self) -> Set[Symbol]:
+        return set(self.instance.parameters) if self.primary else set()
+
+    def visualization_label(self) -> str:
+        return f"{self.instance.submodel.name}: {self.name}"
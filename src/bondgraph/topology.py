@@ -0,0 +1,156 @@
+from array import array
+from typing import Dict, List, Tuple
+
+from bondgraph.common import Bond, Node
+from bondgraph.elements import OnePortElement, TwoPortElement
+from bondgraph.junctions import JunctionEqualEffort, JunctionEqualFlow
+
+# Node type codes
+NODE_ONE_PORT = 0
+NODE_TWO_PORT = 1
+NODE_EQUAL_EFFORT = 2
+NODE_EQUAL_FLOW = 3
+NODE_OTHER = 4
+
+# Causality codes, the integer form of Bond.effort_in_at_to
+CAUSALITY_UNSET = -1
+CAUSALITY_EFFORT_OUT_AT_TO = 0
+CAUSALITY_EFFORT_IN_AT_TO = 1
+
+
+def _node_type_code(node: Node) -> int:
+    if isinstance(node, OnePortElement):
+        return NODE_ONE_PORT
+    elif isinstance(node, TwoPortElement):
+        return NODE_TWO_PORT
+    elif isinstance(node, JunctionEqualEffort):
+        return NODE_EQUAL_EFFORT
+    elif isinstance(node, JunctionEqualFlow):
+        return NODE_EQUAL_FLOW
+    return NODE_OTHER
+
+
+class Topology:
+    """
+    Integer-indexed store of the structure of a bond graph. Nodes and bonds are
+    numbered in the order they were added, bond endpoints and node types are
+    kept in flat arrays, and the adjacency is available in compressed sparse
+    row form, built on first use after a change.
+
+    The Bond and Node objects remain the interface for building graphs and
+    deriving equations; this store mirrors them for traversals and bulk export
+    that would otherwise touch every object.
+    """
+
+    def __init__(self):
+        self.nodes: List[Node] = []
+        self.node_ids: Dict[Node, int] = dict()
+        self.node_types = array("b")
+        self.bond_from = array("l")
+        self.bond_to = array("l")
+        # Causality code of each bond, set when causalities are assigned
+        self.causality: array | None = None
+        self._csr: Tuple[array, array, array] | None = None
+
+    def node_id(self, node: Node) -> int:
+        """
+        Return the number of a node, adding it to the store if it is new.
+        """
+        node_id = self.node_ids.get(node)
+        if node_id is None:
+            node_id = len(self.nodes)
+            self.node_ids[node] = node_id
+            self.nodes.append(node)
+            self.node_types.append(_node_type_code(node))
+        return node_id
+
+    def add_bond(self, bond: Bond) -> int:
+        self.bond_from.append(self.node_id(bond.node_from))  # type: ignore
+        self.bond_to.append(self.node_id(bond.node_to))  # type: ignore
+        self._csr = None
+        return len(self.bond_from) - 1
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def num_bonds(self) -> int:
+        return len(self.bond_from)
+
+    def adjacency(self) -> Tuple[array, array, array]:
+        """
+        Return the adjacency as (indptr, bonds, neighbours) in compressed
+        sparse row form: the bonds of node k and the nodes at their other ends
+        are bonds[indptr[k]:indptr[k + 1]] and neighbours[indptr[k]:indptr[k + 1]].
+        """
+        if self._csr is not None:
+            return self._csr
+        counts = [0] * (self.num_nodes + 1)
+        for node_from, node_to in zip(self.bond_from, self.bond_to):
+            counts[node_from + 1] += 1
+            counts[node_to + 1] += 1
+        for k in range(self.num_nodes):
+            counts[k + 1] += counts[k]
+        indptr = array("l", counts)
+        position = counts[:-1]
+        bonds = array("l", bytes(indptr.itemsize * counts[-1]))
+        neighbours = array("l", bytes(indptr.itemsize * counts[-1]))
+        for bond_id, (node_from, node_to) in enumerate(
+            zip(self.bond_from, self.bond_to)
+        ):
+            bonds[position[node_from]] = bond_id
+            neighbours[position[node_from]] = node_to
+            position[node_from] += 1
+            bonds[position[node_to]] = bond_id
+            neighbours[position[node_to]] = node_from
+            position[node_to] += 1
+        self._csr = (indptr, bonds, neighbours)
+        return self._csr
+
+    def components(self) -> List[List[int]]:
+        """
+        Split the graph into connected components, returned as lists of bond
+        numbers in the order the bonds were added. Components are ordered by
+        their first bond.
+        """
+        parent = list(range(self.num_nodes))
+
+        def find(node_id: int) -> int:
+            root = node_id
+            while parent[root] != root:
+                root = parent[root]
+            while parent[node_id] != root:
+                parent[node_id], node_id = root, parent[node_id]
+            return root
+
+        for node_from, node_to in zip(self.bond_from, self.bond_to):
+            root_from, root_to = find(node_from), find(node_to)
+            if root_from != root_to:
+                parent[root_to] = root_from
+
+        components: Dict[int, List[int]] = dict()
+        for bond_id, node_from in enumerate(self.bond_from):
+            components.setdefault(find(node_from), []).append(bond_id)
+        return list(components.values())
+
+    def degree(self, node_id: int) -> int:
+        indptr = self.adjacency()[0]
+        return indptr[node_id + 1] - indptr[node_id]
+
+
+def causality_array(bonds: List[Bond]) -> array:
+    """
+    Export the causalities of bonds as an array of causality codes.
+    """
+    return array(
+        "b",
+        (
+            (
+                CAUSALITY_UNSET
+                if bond.effort_in_at_to is None
+                else int(bond.effort_in_at_to)
+            )
+            for bond in bonds
+        ),
+    )
@@ -0,0 +1,227 @@
+import json
+from typing import Dict, List, Sequence
+
+import numpy as np
+from sympy import Indexed
+
+from bondgraph.numeric import _channels
+
+_MAGIC = b"BGTRAJ\x00\x01"
+# Magic, data offset, committed rows and metadata length, followed by metadata
+_HEADER_FIELDS = 4
+_HEADER_SIZE = _HEADER_FIELDS * 8
+# Rows start on a page boundary so they can be mapped without copying
+_ALIGNMENT = 4096
+
+
+def _record_dtype(n_states: int, n_outputs: int, batch_shape: tuple) -> np.dtype:
+    return np.dtype(
+        [
+            ("t", "<f8"),
+            ("x", "<f8", (n_states,) + batch_shape),
+            ("y", "<f8", (n_outputs,) + batch_shape),
+        ]
+    )
+
+
+def _channel_counts(items: Sequence) -> List[int]:
+    """
+    Count the rows of each state or output, one per channel of the vector
+    symbols it contains. Names given as strings take a single row.
+    """
+    counts: List[int] = []
+    for item in items:
+        indexed = [
+            s for s in getattr(item, "free_symbols", ()) if isinstance(s, Indexed)
+        ]
+        counts.append(_channels(indexed[0]) if indexed else 1)
+    return counts
+
+
+def _offsets(counts: Sequence[int]) -> List[slice]:
+    offsets: List[slice] = []
+    start = 0
+    for count in counts:
+        offsets.append(slice(start, start + count))
+        start += count
+    return offsets
+
+
+class TrajectoryWriter:
+    """
+    Stream trajectories to a preallocated, memory-mapped binary file. Each
+    row holds a time, the states and optionally outputs of a batch of
+    simulations, and only every `decimation`-th row passed to append() is
+    stored. Vector states and outputs take one row per channel, as in
+    bondgraph.numeric.CompiledRHS.
+
+    Stored rows are committed, i.e. flushed and counted in the header, every
+    `commit_every` rows and when the writer is closed. Readers opening the
+    file with Trajectory only see committed rows, so they can read a file
+    while it is still being written.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        states: Sequence,
+        capacity: int,
+        outputs: Sequence = (),
+        batch_shape: tuple = (),
+        decimation: int = 1,
+        commit_every: int = 1024,
+        metadata: Dict | None = None,
+    ):
+        if decimation < 1:
+            raise ValueError("Decimation must be a positive integer")
+        self.path = path
+        self.capacity = capacity
+        self.decimation = decimation
+        self.commit_every = commit_every
+        self.rows = 0
+        self.committed = 0
+        self._calls = 0
+
+        state_channels = _channel_counts(states)
+        output_channels = _channel_counts(outputs)
+        header = {
+            "states": [str(s) for s in states],
+            "outputs": [str(y) for y in outputs],
+            "state_channels": state_channels,
+            "output_channels": output_channels,
+            "batch_shape": list(batch_shape),
+            "capacity": capacity,
+            "decimation": decimation,
+            "metadata": metadata if metadata is not None else dict(),
+        }
+        encoded = json.dumps(header).encode()
+        offset = -(-(_HEADER_SIZE + len(encoded)) // _ALIGNMENT) * _ALIGNMENT
+        self.dtype = _record_dtype(
+            sum(state_channels), sum(output_channels), tuple(batch_shape)
+        )
+
+        with open(path, "wb") as file:
+            file.write(_MAGIC)
+            file.write(np.array([offset, 0, len(encoded)], dtype="<u8").tobytes())
+            file.write(encoded)
+            file.truncate(offset + capacity * self.dtype.itemsize)
+        self._header = np.memmap(path, dtype="<u8", mode="r+", shape=(_HEADER_FIELDS,))
+        self._data = None
+        if capacity > 0:
+            self._data = np.memmap(
+                path, dtype=self.dtype, mode="r+", offset=offset, shape=(capacity,)
+            )
+
+    def due(self) -> bool:
+        """
+        Return whether the next row passed to append() will be stored.
+        """
+        return self._calls % self.decimation == 0
+
+    def append(self, t: float, x, y=None):
+        """
+        Store a row, unless it is skipped by the decimation.
+        """
+        calls, self._calls = self._calls, self._calls + 1
+        if calls % self.decimation:
+            return
+        if self._data is None or self.rows >= self.capacity:
+            raise ValueError(f"Trajectory file is full at {self.capacity} rows")
+        row = self._data[self.rows]
+        row["t"] = t
+        row["x"] = x
+        if y is not None:
+            row["y"] = y
+        self.rows += 1
+        if self.rows - self.committed >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        """
+        Flush the stored rows to the file and make them visible to readers.
+        """
+        if self.rows == self.committed:
+            return
+        if self._data is not None:
+            self._data.flush()
+        # Rows are counted only once their data has been written
+        self._header[2] = self.rows
+        self._header.flush()
+        self.committed = self.rows
+
+    def close(self):
+        self.commit()
+        self._data = None
+
+    def __enter__(self) -> "TrajectoryWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Trajectory:
+    """
+    Read-only view of the committed rows of a trajectory file written by
+    TrajectoryWriter. The `t`, `x` and `y` arrays, of shape (rows,),
+    (rows, n_states, *batch_shape) and (rows, n_outputs, *batch_shape), are
+    mapped from the file without copying. The channels of a vector state or
+    output are consecutive rows, as counted in `state_channels` and
+    `output_channels`, and state() and output() select them by name. Call
+    refresh() to pick up rows committed since the file was opened.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            fixed = file.read(_HEADER_SIZE)
+            if len(fixed) < _HEADER_SIZE or fixed[:8] != _MAGIC:
+                raise ValueError(f"{path} is not a bondgraph trajectory file")
+            self._offset, _rows, length = np.frombuffer(fixed[8:], dtype="<u8")
+            header = json.loads(file.read(int(length)).decode())
+        self.states: List[str] = header["states"]
+        self.outputs: List[str] = header["outputs"]
+        self.batch_shape = tuple(header["batch_shape"])
+        self.capacity: int = header["capacity"]
+        self.decimation: int = header["decimation"]
+        self.metadata: Dict = header["metadata"]
+        self.state_channels: List[int] = header["state_channels"]
+        self.output_channels: List[int] = header["output_channels"]
+        self._state_rows = dict(zip(self.states, _offsets(self.state_channels)))
+        self._output_rows = dict(zip(self.outputs, _offsets(self.output_channels)))
+        self.dtype = _record_dtype(
+            sum(self.state_channels), sum(self.output_channels), self.batch_shape
+        )
+        self.refresh()
+
+    def refresh(self):
+        """
+        Map all rows committed so far.
+        """
+        header = np.fromfile(self.path, dtype="<u8", count=_HEADER_FIELDS)
+        self.rows = int(header[2])
+        if self.rows == 0:
+            self.records = np.zeros(0, dtype=self.dtype)
+        else:
+            self.records = np.memmap(
+                self.path,
+                dtype=self.dtype,
+                mode="r",
+                offset=int(self._offset),
+                shape=(self.rows,),
+            )
+        self.t = self.records["t"]
+        self.x = self.records["x"]
+        self.y = self.records["y"]
+
+    def state(self, name: str) -> np.ndarray:
+        """
+        Return the rows of a state, of shape (rows, channels, *batch_shape).
+        """
+        return self.x[:, self._state_rows[name]]
+
+    def output(self, name: str) -> np.ndarray:
+        """
+        Return the rows of an output, of shape (rows, channels, *batch_shape).
+        """
+        return self.y[:, self._output_rows[name]]
@@ -0,0 +1,101 @@
+import os
+import shutil
+
+from bondgraph.core import Bond, BondGraph
+from bondgraph.junctions import JunctionEqualFlow
+from bondgraph.elements import Element_R, Element_I, Element_C, Source_effort
+
+from sympy import Idx, IndexedBase, Symbol as _
+import pytest
+
+np = pytest.importorskip("numpy")
+if shutil.which(os.environ.get("CC", "cc")) is None:
+    pytest.skip("No C compiler available", allow_module_level=True)
+
+
+def _rlc_graph():
+    g = BondGraph()
+    j = JunctionEqualFlow("j")
+    g.add(Bond(Source_effort("F", _("F")), j))
+    g.add(Bond(j, Element_R("r", _("r"))))
+    g.add(Bond(j, Element_I("i", _("i"), _("p"))))
+    g.add(Bond(j, Element_C("c", _("c"), _("q"))))
+    return g
+
+
+def test_compile_c(tmp_path):
+    g = _rlc_graph()
+    compiled = g.compile_c(build_dir=str(tmp_path))
+    rhs = g.compile_rhs()
+    assert compiled.states == rhs.states
+    assert compiled.parameters == rhs.parameters
+
+    rng = np.random.default_rng(5)
+    x = rng.random((2, 100))
+    params = 1.0 + rng.random((4, 100))
+    assert np.allclose(compiled(0.0, x, params), rhs(0.0, x, params))
+    # Unbatched, shared parameters and non-contiguous arrays
+    assert np.allclose(
+        compiled(0.0, x[:, 3], params[:, 3]), rhs(0.0, x[:, 3], params[:, 3])
+    )
+    assert np.allclose(compiled(0.0, x, params[:, 0]), rhs(0.0, x, params[:, 0]))
+    assert np.allclose(
+        compiled(0.0, x[:, ::2], params[:, ::2]), rhs(0.0, x[:, ::2], params[:, ::2])
+    )
+
+    jacobian = g.compile_jacobian()
+    assert compiled.nnz == jacobian.nnz
+    assert np.allclose(
+        compiled.dense_jacobian(0.0, x, params), jacobian.dense(0.0, x, params)
+    )
+
+    # The library built in build_dir is reused
+    libraries = [name for name in os.listdir(tmp_path) if name.endswith(".so")]
+    assert len(libraries) == 1
+    g.compile_c(build_dir=str(tmp_path))
+    assert os.listdir(tmp_path).count(libraries[0]) == 1
+
+
+def test_compile_c_algebraic():
+    g = _rlc_graph()
+    compiled = g.compile_c(inline=False)
+    assert "const double bg_a0" in compiled.source
+    rhs = g.compile_rhs()
+    x = np.random.default_rng(7).random((2, 30))
+    params = [1.0, 0.5, 2.0, 4.0]
+    assert np.allclose(compiled(0.0, x, params), rhs(0.0, x, params))
+    assert np.allclose(
+        compiled.dense_jacobian(0.0, x, params),
+        g.compile_jacobian().dense(0.0, x, params),
+    )
+
+
+def test_compile_c_vector():
+    n = 20
+    k = Idx("k", n)
+    r, c, q = IndexedBase("r"), IndexedBase("c"), IndexedBase("q")
+    g = BondGraph()
+    j = JunctionEqualFlow("j")
+    g.add(Bond(Source_effort("F", _("F")), j, k))
+    g.add(Bond(j, Element_R("r", r[k]), k))
+    g.add(Bond(j, Element_C("c", c[k], q[k]), k))
+
+    compiled = g.compile_c()
+    rhs = g.compile_rhs()
+    assert compiled.n_states == n
+    x = np.random.default_rng(6).random((n, 3))
+    params = np.linspace(1.0, 2.0, 2 * n + 1)
+    assert np.allclose(compiled(0.0, x, params), rhs(0.0, x, params))
+    assert np.allclose(
+        compiled.jacobian(0.0, x, params), g.compile_jacobian()(0.0, x, params)
+    )
+
+
+def test_simulate_compiled_c():
+    from bondgraph.simulation import simulate
+
+    g = _rlc_graph()
+    params = [1.0, 0.5, 2.0, 4.0]
+    t = np.linspace(0.0, 1.0, 11)
+    expected = simulate(g, [0.0, 0.0], params, t).x
+    assert np.allclose(simulate(g.compile_c(), [0.0, 0.0], params, t).x, expected)
@@ -1,5 +1,12 @@
 from bondgraph.common import AlgebraicLoopError
 from bondgraph.core import Bond, BondGraph
+from bondgraph.instrumentation import DerivationStats
+from bondgraph.topology import (
+    CAUSALITY_EFFORT_IN_AT_TO,
+    CAUSALITY_EFFORT_OUT_AT_TO,
+    NODE_EQUAL_FLOW,
+    NODE_ONE_PORT,
+)
 from bondgraph.junctions import JunctionEqualEffort, JunctionEqualFlow
 from bondgraph.elements import (
     Element_R,
@@ -164,3 +171,412 @@ def test_algebraic_loops():
 
     with pytest.raises(AlgebraicLoopError):
         g.get_state_equations()
+
+
+def test_causality_long_chain():
+    F = _("F")
+
+    g = BondGraph()
+    previous = JunctionEqualFlow("j0")
+    g.add(Bond(Source_effort("F", F), previous))
+    for k in range(1, 200):
+        if k % 2:
+            junction = JunctionEqualEffort(f"j{k}")
+            g.add(Bond(junction, Element_C(f"c{k}", _(f"c{k}"), _(f"q{k}"))))
+        else:
+            junction = JunctionEqualFlow(f"j{k}")
+            g.add(Bond(junction, Element_I(f"i{k}", _(f"i{k}"), _(f"p{k}"))))
+        g.add(Bond(previous, junction))
+        previous = junction
+    g.add(Bond(previous, Element_R("r", _("r"))))
+
+    g.assign_causalities()
+    assert g.all_causalities_set()
+    assert g.preferred_causalities_valid()
+
+
+def test_junction_chain_substitution():
+    F = _("F")
+    r = _("r")
+    i = _("i")
+    p = _("p")
+
+    g = BondGraph()
+    previous = JunctionEqualFlow("j0")
+    g.add(Bond(Source_effort("F", F), previous))
+    for k in range(1, 50):
+        junction = JunctionEqualFlow(f"j{k}")
+        g.add(Bond(previous, junction))
+        previous = junction
+    g.add(Bond(previous, Element_R("r", r)))
+    g.add(Bond(previous, Element_I("i", i, p)))
+
+    eqs = g.get_state_equations()
+    assert eqs[p] == (F - r * p / i)
+
+
+def test_algebraic_equations():
+    F = _("F")
+    i = _("i")
+    p = _("p")
+
+    g = BondGraph()
+    previous = JunctionEqualFlow("j0")
+    g.add(Bond(Source_effort("F", F), previous))
+    resistor_bonds = []
+    for k in range(1, 50):
+        junction = JunctionEqualFlow(f"j{k}")
+        g.add(Bond(previous, junction))
+        resistor_bonds.append(Bond(junction, Element_R(f"r{k}", _(f"r{k}"))))
+        g.add(resistor_bonds[-1])
+        previous = junction
+    g.add(Bond(previous, Element_I("i", i, p)))
+
+    algebraic = g.get_algebraic_equations()
+    # The shared flow is computed once, and every other variable is inlined
+    assert len(algebraic.assignments) == 1
+    flow, value = algebraic.assignments[0]
+    assert value == p / i
+    assert algebraic.state_equations[p].count(flow) == 49
+
+    inlined = algebraic.state_equations[p].xreplace({flow: value})
+    assert (inlined - g.get_state_equations()[p]).expand() == 0
+
+    # Kept variables are assigned after the variables they depend on
+    kept = [bond.effort_symbol for bond in resistor_bonds[-2:]]
+    algebraic = g.get_algebraic_equations(keep=kept)
+    assert [lhs for lhs, _rhs in algebraic.assignments][0] == flow
+    assert set(kept) <= {lhs for lhs, _rhs in algebraic.assignments}
+
+
+def test_state_equation_slice():
+    F = _("F")
+    g = BondGraph()
+    previous = JunctionEqualEffort("j0")
+    g.add(Bond(Source_effort("F", F), previous))
+    states = []
+    for k in range(1, 30):
+        flow_junction = JunctionEqualFlow(f"s{k}")
+        effort_junction = JunctionEqualEffort(f"j{k}")
+        g.add(Bond(previous, flow_junction))
+        g.add(Bond(flow_junction, Element_I(f"i{k}", _(f"i{k}"), _(f"p{k}"))))
+        g.add(Bond(flow_junction, effort_junction))
+        g.add(Bond(effort_junction, Element_C(f"c{k}", _(f"c{k}"), _(f"q{k}"))))
+        g.add(Bond(effort_junction, Element_R(f"r{k}", _(f"r{k}"))))
+        states += [_(f"p{k}"), _(f"q{k}")]
+        previous = effort_junction
+
+    stats = DerivationStats()
+    sliced = g.get_state_equations(stats, only=[_("p2"), _("q29")])
+    assert list(sliced) == [_("p2"), _("q29")]
+    assert sliced[_("p2")] == _("q1") / _("c1") - _("q2") / _("c2")
+    # Only the nodes around the two states are formulated
+    assert stats.iterations["node_equations"] < 20
+    assert g.get_state_equation(_("q5")) == (
+        _("p5") / _("i5") - _("p6") / _("i6") - _("q5") / (_("c5") * _("r5"))
+    )
+    with pytest.raises(ValueError):
+        g.get_state_equation(F)
+
+    full = g.get_state_equations()
+    assert list(full) == states
+    assert g.get_state_equations(only=states) == full
+
+
+def test_algebraic_loop_symbols():
+    from bondgraph.core import _resolve_equations
+
+    a = _("a")
+    b = _("b")
+    c = _("c")
+    x = _("x")
+
+    resolved = _resolve_equations({a: b + x, b: 2 * c, c: x})
+    assert resolved[a] == 3 * x
+
+    with pytest.raises(AlgebraicLoopError) as error:
+        _resolve_equations({a: b + x, b: 2 * c, c: a})
+    assert set(error.value.symbols) == {a, b, c}
+
+
+def test_cached_derivation():
+    F = _("F")
+    r = _("r")
+    i = _("i")
+    p = _("p")
+    c = _("c")
+    q = _("q")
+
+    j = JunctionEqualFlow("j")
+    g = BondGraph()
+    g.add(Bond(Source_effort("F", F), j))
+    g.add(Bond(j, Element_R("r", r)))
+    g.add(Bond(j, Element_I("i", i, p)))
+
+    eqs = g.get_state_equations()
+    assert g.get_state_equations() == eqs
+    g.assign_causalities()
+    assert g.cache_info().hits == 2
+
+    # Adding a bond invalidates the cached causalities and equations
+    g.add(Bond(j, Element_C("c", c, q)))
+    eqs = g.get_state_equations()
+    assert eqs[p] == F - r * p / i - q / c
+    assert eqs[q] == p / i
+    assert g.get_parameters() == {F, r, i, c}
+
+
+def test_derivation_stats():
+    j = JunctionEqualFlow("j")
+    g = BondGraph()
+    g.add(Bond(Source_effort("F", _("F")), j))
+    g.add(Bond(j, Element_R("r", _("r"))))
+    g.add(Bond(j, Element_I("i", _("i"), _("p"))))
+
+    stats = DerivationStats()
+    g.get_state_equations(stats=stats)
+    assert set(stats.phase_times) == {
+        "assign_causalities",
+        "formulate_equations",
+        "junction_identities",
+        "substitute_junction_equations",
+        "resolve_equations",
+        "state_equations",
+    }
+    assert stats.cache is None
+    assert stats.iterations["node_equations"] == 4
+    assert stats.iterations["state_equations"] == 1
+    assert stats.xreplace_calls["state_equations"] == 1
+    # p' = e_3 before substitution, F - r*p/i after
+    assert stats.ops_before["state_equations"] == 0
+    assert stats.ops_after["state_equations"] == 3
+
+    stats = DerivationStats()
+    g.get_state_equations(stats=stats)
+    assert stats.cache == "memory"
+    assert stats.phase_times == {}
+
+
+def test_bind_parameters():
+    F, r, i, p, c, q = _("F"), _("r"), _("i"), _("p"), _("c"), _("q")
+    j = JunctionEqualFlow("j")
+    g = BondGraph()
+    g.add(Bond(Source_effort("F", F), j))
+    g.add(Bond(j, Element_R("r", r)))
+    g.add(Bond(j, Element_I("i", i, p)))
+    g.add(Bond(j, Element_C("c", c, q)))
+    unbound = g.get_state_equations()
+    fingerprint = g.fingerprint()
+
+    g.bind_parameters({r: 2, i: 4})
+    assert g.get_parameters() == {F, c}
+    assert g.fingerprint() != fingerprint
+    eqs = g.get_state_equations()
+    assert eqs == {p: F - p / 2 - q / c, q: p / 4}
+    assert eqs == {var: rhs.subs({r: 2, i: 4}) for var, rhs in unbound.items()}
+
+    # Parameters may also be given as numbers on the elements
+    j = JunctionEqualFlow("j")
+    g = BondGraph()
+    g.add(Bond(Source_effort("F", F), j))
+    g.add(Bond(j, Element_R("r", 2)))
+    g.add(Bond(j, Element_I("i", i, p)))
+    assert g.get_parameters() == {F, i}
+    assert g.get_state_equations() == {p: F - 2 * p / i}
+
+
+def test_topology():
+    se = Source_effort("F", _("F"))
+    j = JunctionEqualFlow("j")
+    r = Element_R("r", _("r"))
+    i = Element_I("i", _("i"), _("p"))
+    g = BondGraph()
+    g.add(Bond(se, j))
+    g.add(Bond(j, r))
+    g.add(Bond(j, i))
+
+    topology = g.get_topology()
+    assert topology.nodes == [se, j, r, i]
+    assert list(topology.node_types) == [
+        NODE_ONE_PORT,
+        NODE_EQUAL_FLOW,
+        NODE_ONE_PORT,
+        NODE_ONE_PORT,
+    ]
+    indptr, bonds, neighbours = topology.adjacency()
+    assert list(indptr) == [0, 1, 4, 5, 6]
+    assert sorted(bonds[indptr[1] : indptr[2]]) == [0, 1, 2]
+    assert sorted(neighbours[indptr[1] : indptr[2]]) == [0, 2, 3]
+    assert topology.causality is None
+
+    g.assign_causalities()
+    assert list(topology.causality) == [
+        CAUSALITY_EFFORT_IN_AT_TO,
+        CAUSALITY_EFFORT_OUT_AT_TO,
+        CAUSALITY_EFFORT_IN_AT_TO,
+    ]
+
+    # Bonds and built-in nodes store their attributes in slots
+    assert not hasattr(g._bonds[0], "__dict__")
+    assert not hasattr(j, "__dict__") and not hasattr(i, "__dict__")
+
+    with pytest.raises(Exception):
+        g.add(Bond(j, r))
+
+
+def _fingerprint_graph(reverse: bool, resistance: str = "r", cache=None):
+    e_se = Source_effort("se", _("F"))
+    e_r = Element_R("resistor", _(resistance))
+    e_i = Element_I("inertia", _("i"), _("p"))
+    e_c = Element_C("compliance", _("c"), _("q"))
+    j1 = JunctionEqualFlow("a")
+    j2 = JunctionEqualEffort("b")
+    bonds = [
+        Bond(e_se, j1),
+        Bond(j1, e_i),
+        Bond(j1, j2),
+        Bond(j2, e_c),
+        Bond(j2, e_r),
+    ]
+    g = BondGraph(equation_cache=cache)
+    for bond in reversed(bonds) if reverse else bonds:
+        g.add(bond)
+    return g
+
+
+def test_fingerprint():
+    fingerprint = _fingerprint_graph(False).fingerprint()
+    assert _fingerprint_graph(True).fingerprint() == fingerprint
+    assert _fingerprint_graph(False, "r2").fingerprint() != fingerprint
+
+
+def test_equation_cache(tmp_path):
+    from bondgraph.cache import EquationCache
+
+    cache = EquationCache(str(tmp_path))
+    eqs = _fingerprint_graph(False, cache=cache).get_state_equations()
+    assert cache.misses == 1
+
+    warm_cache = EquationCache(str(tmp_path))
+    warm = _fingerprint_graph(True, cache=warm_cache)
+    assert warm.get_state_equations() == eqs
+    assert warm_cache.hits == 1
+    # Derivation, including causality assignment, was skipped entirely
+    assert not warm.all_causalities_set()
+
+
+def test_equation_cache_stale_entries(tmp_path):
+    from bondgraph.cache import EquationCache
+
+    g = _fingerprint_graph(False)
+    expected = g.get_state_equations()
+
+    # An entry referring to a module that no longer exists
+    cache = EquationCache(str(tmp_path))
+    (tmp_path / f"{g.fingerprint()}.pickle").write_bytes(b"cmissing_module\nThing\n.")
+    eqs = _fingerprint_graph(False, cache=cache).get_state_equations()
+    assert eqs == expected
+    assert cache.misses == 1
+
+    # An entry of another graph sharing the fingerprint
+    cache = EquationCache(str(tmp_path))
+    cache.put(g.fingerprint(), {"structure": (), "state_equations": {}})
+    eqs = _fingerprint_graph(False, cache=cache).get_state_equations()
+    assert eqs == expected
+    assert cache.misses == 1
+
+
+def test_equation_cache_eviction(tmp_path):
+    from bondgraph.cache import EquationCache
+
+    cache = EquationCache(str(tmp_path), max_bytes=1000)
+    for k in range(10):
+        cache.put(f"key{k}", {"data": "x" * 300})
+    assert len(list(tmp_path.iterdir())) <= 3
+    assert cache.get("key9") is not None
+    assert cache.get("key0") is None
+
+
+def test_incremental_derivation():
+    F = _("F")
+    r = _("r")
+    i = _("i")
+    p = _("p")
+    c = _("c")
+    q = _("q")
+
+    g = BondGraph()
+    j1 = JunctionEqualFlow("j1")
+    g.add(Bond(Source_effort("F", F), j1))
+    g.add(Bond(j1, Element_R("r", r)))
+    g.add(Bond(j1, Element_I("i", i, p)))
+    j2 = JunctionEqualEffort("j2")
+    g.add(Bond(Source_flow("v", _("v")), j2))
+    g.add(Bond(j2, Element_C("c", c, q)))
+    eqs = g.get_state_equations()
+
+    # Extend the second subsystem, the first one is reused as it is
+    g.add(Bond(j2, Element_R("r2", _("r2"))))
+    updated = g.get_state_equations()
+    assert updated[p] is eqs[p]
+    assert updated[q] == _("v") - q / (c * _("r2"))
+
+
+def test_edit_after_failed_derivation():
+    def build(extended):
+        g = BondGraph()
+        series = JunctionEqualFlow("1")
+        shunt = JunctionEqualEffort("0")
+        branch = JunctionEqualFlow("1'")
+        g.add(Bond(Source_flow("sf", _("v")), series))
+        g.add(Bond(shunt, series))
+        g.add(Bond(shunt, Element_R("R1", _("R1"))))
+        g.add(Bond(shunt, branch))
+        g.add(Bond(branch, Element_R("R2", _("R2"))))
+        if extended:
+            extend(g, branch)
+        return g, branch
+
+    def extend(g, branch):
+        capacitor_junction = JunctionEqualEffort("0''")
+        inertia_junction = JunctionEqualFlow("1''")
+        g.add(Bond(branch, capacitor_junction))
+        g.add(Bond(capacitor_junction, Element_C("C3", _("C3"), _("q"))))
+        g.add(Bond(branch, inertia_junction))
+        g.add(Bond(inertia_junction, Element_I("I4", _("I4"), _("p"))))
+
+    g, branch = build(False)
+    with pytest.raises(Exception):
+        g.get_state_equations()
+    # The partial causalities of the failed attempt do not carry over
+    extend(g, branch)
+    assert g.get_state_equations() == build(True)[0].get_state_equations()
+
+
+def test_mixed_vector_bonds():
+    from sympy import Idx, IndexedBase
+
+    k = Idx("k", 3)
+    g = BondGraph()
+    j1 = JunctionEqualFlow("j1")
+    j2 = JunctionEqualEffort("j2")
+    g.add(Bond(Source_effort("se", _("U")), j1))
+    g.add(Bond(j1, Element_I("i", _("L"), _("p"))))
+    # A scalar momentum cannot depend on each channel of a vector bond
+    with pytest.raises(ValueError):
+        g.add(Bond(j1, j2, k))
+
+    vector = BondGraph()
+    j = JunctionEqualEffort("j")
+    vector.add(Bond(Source_flow("sf", _("Q")), j))
+    with pytest.raises(ValueError):
+        vector.add(Bond(j, Element_C("c", IndexedBase("c")[k], IndexedBase("q")[k]), k))
+
+    tf = Transformer("tf", _("n"))
+    two_port = BondGraph()
+    two_port.add(Bond(Source_effort("se", IndexedBase("U")[k]), tf, k))
+    with pytest.raises(ValueError):
+        two_port.add(Bond(tf, Element_R("r", _("r"))))
+    # Rejected bonds leave the graph unchanged
+    assert len(g._bonds) == 2 and len(vector._bonds) == 1
+    assert tf.bond_2 is None
@@ -0,0 +1,138 @@
+from bondgraph.common import NonlinearGraphError
+from bondgraph.core import Bond, BondGraph
+from bondgraph.elements import (
+    Element_R,
+    Element_I,
+    Element_C,
+    OnePortElement,
+    Transformer,
+    Source_effort,
+    Source_flow,
+)
+from bondgraph.junctions import JunctionEqualEffort, JunctionEqualFlow
+
+from sympy import Matrix, Equality, Symbol as _, linear_eq_to_matrix, simplify
+import pytest
+
+
+def _linear_graph():
+    e_se = Source_effort("F", _("F"))
+    j1 = JunctionEqualFlow("j1")
+    e_i = Element_I("i", _("i"), _("p"))
+    tf = Transformer("tf", _("d"))
+    j2 = JunctionEqualEffort("j2")
+    j3 = JunctionEqualFlow("j3")
+    e_c = Element_C("c", _("c"), _("q"))
+    e_r = Element_R("r", _("r"))
+    e_sf = Source_flow("v", _("v"))
+
+    g = BondGraph()
+    g.add(Bond(e_se, j1))
+    g.add(Bond(j1, e_i))
+    g.add(Bond(j1, tf))
+    g.add(Bond(tf, j2))
+    g.add(Bond(j2, j3))
+    g.add(Bond(e_sf, j2))
+    g.add(Bond(j3, e_c))
+    g.add(Bond(j3, e_r))
+    return g, e_r
+
+
+def test_state_space_symbolic():
+    g, e_r = _linear_graph()
+    model = g.to_state_space(outputs=[e_r.bond.effort_symbol])
+    assert model.states == [_("p"), _("q")]
+    assert model.inputs == [_("F"), _("v")]
+
+    eqs = _linear_graph()[0].get_state_equations()
+    A, b = linear_eq_to_matrix(list(eqs.values()), model.states)
+    B, _rest = linear_eq_to_matrix(list(-b), model.inputs)
+    assert simplify(Matrix(model.A) - A) == Matrix.zeros(2, 2)
+    assert simplify(Matrix(model.B) - B) == Matrix.zeros(2, 2)
+
+    # Effort over R is r * (v + d * p / i)
+    assert simplify(model.C[0, 0] - _("r") * _("d") / _("i")) == 0
+    assert model.D[0, 1] == _("r")
+
+
+def test_state_space_numeric():
+    np = pytest.importorskip("numpy")
+    g, _e_r = _linear_graph()
+    values = {_("i"): 2.0, _("d"): 3.0, _("c"): 0.5, _("r"): 4.0}
+    model = g.to_state_space(values=values)
+    symbolic = _linear_graph()[0].to_state_space()
+    assert isinstance(model.A, np.ndarray)
+    assert np.allclose(model.A, np.array(symbolic.A.subs(values), dtype=float))
+    assert np.allclose(model.B, np.array(symbolic.B.subs(values), dtype=float))
+    assert np.allclose(model.C, np.eye(2))
+
+    with pytest.raises(ValueError):
+        _linear_graph()[0].to_state_space(values={_("i"): 2.0})
+
+
+def test_state_space_sparse():
+    np = pytest.importorskip("numpy")
+    from bondgraph.linear import CooMatrix
+
+    g, _e_r = _linear_graph()
+    values = {_("i"): 2.0, _("d"): 3.0, _("c"): 0.5, _("r"): 4.0}
+    dense = g.to_state_space(values=values)
+    model = g.to_state_space(values=values, sparse=True)
+    assert isinstance(model.A, CooMatrix)
+    assert model.A.shape == (2, 2) and model.A.nnz == 3
+    for name in ("A", "B", "C", "D"):
+        assert np.array_equal(getattr(model, name).toarray(), getattr(dense, name))
+
+    # Large models are sparse by default
+    g = BondGraph()
+    previous = Source_effort("F", _("F"))
+    for k in range(600):
+        series = JunctionEqualFlow(f"s{k}")
+        shunt = JunctionEqualEffort(f"p{k}")
+        g.add(Bond(previous, series))
+        g.add(Bond(series, Element_I(f"i{k}", _("i"), _(f"p{k}"))))
+        g.add(Bond(series, shunt))
+        g.add(Bond(shunt, Element_C(f"c{k}", _("c"), _(f"q{k}"))))
+        previous = shunt
+    model = g.to_state_space(values={_("i"): 2.0, _("c"): 0.5})
+    assert isinstance(model.A, CooMatrix)
+    assert model.A.shape == (1200, 1200)
+    assert model.A.nnz == 2 * 1200 - 2
+
+    scipy_sparse = pytest.importorskip("scipy.sparse")
+    assert isinstance(model.A.tocsr(), scipy_sparse.csr_array)
+
+
+def test_state_space_nonlinear():
+    class Element_Cubic(OnePortElement):
+        def equations(self, effort, flow):
+            return [Equality(flow, effort**3)]
+
+        @staticmethod
+        def causality_policy():
+            from bondgraph.common import Causality
+
+            return Causality.FixedEffortIn
+
+    g = BondGraph()
+    j = JunctionEqualFlow("j")
+    g.add(Bond(Source_effort("F", _("F")), j))
+    g.add(Bond(j, Element_I("i", _("i"), _("p"))))
+    g.add(Bond(j, Element_Cubic("cubic")))
+
+    with pytest.raises(NonlinearGraphError):
+        g.to_state_space()
+
+
+def test_state_space_vector_bonds():
+    from sympy import Idx, IndexedBase
+
+    k = Idx("k", 5)
+    g = BondGraph()
+    j = JunctionEqualFlow("j")
+    g.add(Bond(Source_effort("F", _("F")), j, k))
+    g.add(Bond(j, Element_R("r", IndexedBase("r")[k]), k))
+    g.add(Bond(j, Element_C("c", IndexedBase("c")[k], IndexedBase("q")[k]), k))
+
+    with pytest.raises(ValueError):
+        g.to_state_space()
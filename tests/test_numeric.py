@@ -0,0 +1,215 @@
+from bondgraph.core import Bond, BondGraph
+from bondgraph.junctions import JunctionEqualFlow
+from bondgraph.elements import Element_R, Element_I, Element_C, Source_effort
+
+from sympy import Symbol as _
+import pytest
+
+np = pytest.importorskip("numpy")
+
+
+def _rlc_graph():
+    g = BondGraph()
+    j = JunctionEqualFlow("j")
+    g.add(Bond(Source_effort("F", _("F")), j))
+    g.add(Bond(j, Element_R("r", _("r"))))
+    g.add(Bond(j, Element_I("i", _("i"), _("p"))))
+    g.add(Bond(j, Element_C("c", _("c"), _("q"))))
+    return g
+
+
+def test_compile_rhs_order():
+    rhs = _rlc_graph().compile_rhs()
+    assert rhs.states == [_("p"), _("q")]
+    assert rhs.parameters == [_("F"), _("c"), _("i"), _("r")]
+
+    # F, c, i, r
+    dx = rhs(0.0, [2.0, 3.0], [1.0, 0.5, 2.0, 4.0])
+    assert dx.shape == (2,)
+    assert np.allclose(dx, [1.0 - 4.0 * 2.0 / 2.0 - 3.0 / 0.5, 2.0 / 2.0])
+
+
+def test_compile_rhs_batch():
+    rhs = _rlc_graph().compile_rhs()
+    x = np.random.default_rng(0).random((2, 1000))
+    params = np.array([1.0, 0.5, 2.0, 4.0])
+
+    dx = rhs(0.0, x, params)
+    assert dx.shape == (2, 1000)
+    for k in (0, 500, 999):
+        assert np.allclose(dx[:, k], rhs(0.0, x[:, k], params))
+
+    # Parameters may be batched as well
+    batched_params = np.repeat(params[:, None], 1000, axis=1)
+    assert np.allclose(rhs(0.0, x, batched_params), dx)
+
+
+def test_jacobian():
+    g = _rlc_graph()
+    p, q, r, i, c = _("p"), _("q"), _("r"), _("i"), _("c")
+
+    jacobian = g.get_jacobian()
+    assert jacobian == {(p, p): -r / i, (p, q): -1 / c, (q, p): 1 / i}
+
+    compiled = g.compile_jacobian()
+    assert compiled.nnz == 3
+    x = np.random.default_rng(2).random((2, 10))
+    params = [1.0, 0.5, 2.0, 4.0]
+    dense = compiled.dense(0.0, x, params)
+    assert dense.shape == (2, 2, 10)
+    assert np.allclose(dense[:, :, 3], [[-2.0, -2.0], [0.5, 0.0]])
+
+
+def test_vector_bonds():
+    from sympy import Idx, IndexedBase
+
+    n = 1000
+    k = Idx("k", n)
+    r, c, q = IndexedBase("r"), IndexedBase("c"), IndexedBase("q")
+    g = BondGraph()
+    j = JunctionEqualFlow("j")
+    g.add(Bond(Source_effort("F", _("F")), j, k))
+    g.add(Bond(j, Element_R("r", r[k]), k))
+    g.add(Bond(j, Element_C("c", c[k], q[k]), k))
+
+    # One indexed equation, independent of the number of cells
+    assert g.get_state_equations() == {q[k]: (_("F") - q[k] / c[k]) / r[k]}
+
+    rhs = g.compile_rhs()
+    assert rhs.states == [q[k]]
+    assert rhs.parameters == [_("F"), c[k], r[k]]
+    assert (rhs.n_states, rhs.n_parameters) == (n, 2 * n + 1)
+
+    rng = np.random.default_rng(3)
+    x = rng.random((n, 4))
+    cs, rs = 1.0 + rng.random(n), 1.0 + rng.random(n)
+    params = np.concatenate([[2.0], cs, rs])
+    dx = rhs(0.0, x, params[:, None])
+    assert dx.shape == (n, 4)
+    assert np.allclose(dx, (2.0 - x / cs[:, None]) / rs[:, None])
+
+    jacobian = g.compile_jacobian()
+    assert jacobian.nnz == n
+    assert np.array_equal(jacobian.rows, np.arange(n))
+    assert np.allclose(jacobian(0.0, x[:, 0], params), -1 / (cs * rs))
+
+
+def test_export_python(tmp_path):
+    import importlib.util
+
+    g = _rlc_graph()
+    path = tmp_path / "rlc_model.py"
+    source = g.export_python(str(path))
+    assert "sympy" not in source
+    # p/i appears in both state equations but is computed once
+    assert source.count("p/i") == 1
+
+    spec = importlib.util.spec_from_file_location("rlc_model", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert module.STATES == ["p", "q"]
+    assert module.PARAMETERS == ["F", "c", "i", "r"]
+
+    rhs = g.compile_rhs()
+    x = np.random.default_rng(4).random((2, 50))
+    params = [1.0, 0.5, 2.0, 4.0]
+    assert np.allclose(module.rhs(0.0, x, params), rhs(0.0, x, params))
+
+
+def test_export_python_vector_batch(tmp_path):
+    import importlib.util
+    from sympy import Idx, IndexedBase
+
+    n = 5
+    k = Idx("k", n)
+    r, c, q = IndexedBase("r"), IndexedBase("c"), IndexedBase("q")
+    g = BondGraph()
+    j = JunctionEqualFlow("j")
+    g.add(Bond(Source_effort("F", _("F")), j, k))
+    g.add(Bond(j, Element_R("r", r[k]), k))
+    g.add(Bond(j, Element_C("c", c[k], q[k]), k))
+
+    path = tmp_path / "vector_model.py"
+    g.export_python(str(path))
+    spec = importlib.util.spec_from_file_location("vector_model", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    rhs = g.compile_rhs()
+    rng = np.random.default_rng(7)
+    params = np.concatenate([[2.0], 1.0 + rng.random(2 * n)])
+    # Batched states with shared parameters, and the other way around
+    x = rng.random((n, 4))
+    assert np.allclose(module.rhs(0.0, x, params), rhs(0.0, x, params))
+    batch_params = params[:, None] * (1.0 + rng.random(3))
+    x = rng.random(n)
+    expected = rhs(0.0, x, batch_params)
+    assert expected.shape == (n, 3)
+    assert np.allclose(module.rhs(0.0, x, batch_params), expected)
+
+
+def test_compile_rhs_algebraic(tmp_path):
+    import importlib.util
+
+    g = _rlc_graph()
+    rhs = g.compile_rhs()
+    algebraic = g.compile_rhs(inline=False)
+    x = np.random.default_rng(6).random((2, 50))
+    params = [1.0, 0.5, 2.0, 4.0]
+    assert np.allclose(algebraic(0.0, x, params), rhs(0.0, x, params))
+
+    path = tmp_path / "rlc_algebraic.py"
+    source = g.export_python(str(path), inline=False)
+    assert "f_3 = p/i" in source
+    spec = importlib.util.spec_from_file_location("rlc_algebraic", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert np.allclose(module.rhs(0.0, x, params), rhs(0.0, x, params))
+
+
+def test_outputs():
+    from sympy import Idx, IndexedBase
+
+    g = BondGraph()
+    j = JunctionEqualFlow("j")
+    source = Bond(Source_effort("F", _("F")), j)
+    resistor = Bond(j, Element_R("r", _("r")))
+    for bond in (source, resistor):
+        g.add(bond)
+    g.add(Bond(j, Element_I("i", _("i"), _("p"))))
+    g.add(Bond(j, Element_C("c", _("c"), _("q"))))
+
+    p, r, i = _("p"), _("r"), _("i")
+    outputs = g.get_output_equations([resistor.flow_symbol, resistor.power()])
+    assert outputs == {
+        resistor.flow_symbol: p / i,
+        resistor.power(): r * p**2 / i**2,
+    }
+
+    rhs = g.compile_rhs(outputs=[source.power(), resistor.power()])
+    assert rhs.n_outputs == 2
+    x = np.random.default_rng(8).random((2, 20))
+    params = [1.0, 0.5, 2.0, 4.0]
+    y = rhs.observe(0.0, x, params)
+    assert y.shape == (2, 20)
+    assert np.allclose(y, [1.0 * x[0] / 2.0, 4.0 * (x[0] / 2.0) ** 2])
+    assert np.allclose(
+        g.compile_rhs(inline=False, outputs=[resistor.power()]).observe(0.0, x, params),
+        y[1:],
+    )
+
+    # Outputs of vector bonds take one row per channel
+    n = 5
+    k = Idx("k", n)
+    vector = BondGraph()
+    j = JunctionEqualFlow("j")
+    vector.add(Bond(Source_effort("F", _("F")), j, k))
+    resistor = Bond(j, Element_R("r", IndexedBase("r")[k]), k)
+    vector.add(resistor)
+    vector.add(Bond(j, Element_C("c", _("c"), IndexedBase("q")[k]), k))
+    rhs = vector.compile_rhs(outputs=[_("F"), resistor.power()])
+    params = np.concatenate([[2.0], [1.0], 1.0 + np.arange(n)])
+    x = np.ones(n)
+    y = rhs.observe(0.0, x, params)
+    assert y.shape == (n + 1,)
+    assert np.allclose(y, np.concatenate([[2.0], 1.0 / (1.0 + np.arange(n))]))
@@ -0,0 +1,42 @@
+from bondgraph.core import Bond, BondGraph
+from bondgraph.elements import Element_R, Element_I, Element_C, Source_effort
+from bondgraph.junctions import JunctionEqualEffort, JunctionEqualFlow
+from bondgraph.parallel import connected_components, get_state_equations_parallel
+
+from sympy import Symbol as _
+
+
+def _subsystems(count: int):
+    # Independent Se -> 1 -> I, R -> 0 -> C chains sharing the source effort F
+    g = BondGraph()
+    for k in range(count):
+        series = JunctionEqualFlow(f"s_{k}")
+        shunt = JunctionEqualEffort(f"p_{k}")
+        g.add(Bond(Source_effort(f"se_{k}", _("F")), series))
+        g.add(Bond(series, Element_I(f"i_{k}", _(f"m_{k}"), _(f"p_{k}"))))
+        g.add(Bond(series, Element_R(f"r_{k}", _(f"r_{k}"))))
+        g.add(Bond(series, shunt))
+        g.add(Bond(shunt, Element_C(f"c_{k}", _(f"c_{k}"), _(f"q_{k}"))))
+        g.add(Bond(shunt, Element_R(f"g_{k}", _(f"g_{k}"))))
+    return g
+
+
+def test_connected_components():
+    g = _subsystems(3)
+    components = connected_components(g)
+    assert len(components) == 3
+    assert [len(component) for component in components] == [6, 6, 6]
+    assert components[1][0] is g._bonds[6]
+
+
+def test_parallel_derivation():
+    expected = _subsystems(5).get_state_equations()
+
+    g = _subsystems(5)
+    eqs = get_state_equations_parallel(g, max_workers=2)
+    assert eqs == expected
+    assert list(eqs) == list(expected)
+
+    # The result is cached by the graph like a serial derivation
+    assert g.get_state_equations() == expected
+    assert g.cache_info().hits == 1
@@ -0,0 +1,60 @@
+import os
+import shutil
+
+from bondgraph.core import Bond, BondGraph
+from bondgraph.junctions import JunctionEqualFlow
+from bondgraph.elements import Element_R, Element_I, Element_C, Source_effort
+
+from sympy import Symbol as _
+import pytest
+
+np = pytest.importorskip("numpy")
+if shutil.which(os.environ.get("CC", "cc")) is None:
+    pytest.skip("No C compiler available", allow_module_level=True)
+
+from bondgraph.simulation import simulate  # noqa: E402
+
+
+def _rlc_graph():
+    g = BondGraph()
+    j = JunctionEqualFlow("j")
+    g.add(Bond(Source_effort("F", _("F")), j))
+    g.add(Bond(j, Element_R("r", _("r"))))
+    g.add(Bond(j, Element_I("i", _("i"), _("p"))))
+    g.add(Bond(j, Element_C("c", _("c"), _("q"))))
+    return g
+
+
+def test_stepper(tmp_path):
+    g = _rlc_graph()
+    stepper = g.stepper(build_dir=str(tmp_path))
+    assert stepper.inputs == [_("F")]
+    assert stepper.parameters == [_("F"), _("c"), _("i"), _("r")]
+
+    stepper.set_parameter(_("c"), 0.5)
+    stepper.set_parameter(_("i"), 2.0)
+    stepper.set_parameter(_("r"), 4.0)
+    x, params = stepper.x, stepper.params
+    for _step in range(100):
+        stepper.step(0.01, [1.0])
+    # Buffers are updated in place
+    assert stepper.x is x and stepper.params is params
+    assert np.isclose(stepper.t, 1.0)
+
+    t = np.linspace(0.0, 1.0, 101)
+    result = simulate(g.compile_rhs(), [0.0, 0.0], [1.0, 0.5, 2.0, 4.0], t)
+    assert np.allclose(stepper.x, result.x[-1])
+
+    # Inputs can be written directly between steps
+    stepper.input_values[0] = 0.0
+    stepper.step(0.01)
+    assert stepper.params[0] == 0.0
+
+    stats = stepper.latency()
+    assert stats.steps == 101
+    assert 0.0 < stats.mean <= stats.worst
+    assert stats.p99 <= stats.worst
+
+    stepper.reset(x0=[1.0, 0.0])
+    assert stepper.t == 0.0 and stepper.latency().steps == 0
+    assert np.array_equal(stepper.x, [1.0, 0.0])
@@ -0,0 +1,155 @@
+from bondgraph.core import Bond, BondGraph
+from bondgraph.junctions import JunctionEqualFlow
+from bondgraph.elements import Element_R, Element_I, Source_effort
+
+from sympy import Symbol as _
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from bondgraph.simulation import simulate  # noqa: E402
+
+
+def _ri_graph():
+    g = BondGraph()
+    j = JunctionEqualFlow("j")
+    g.add(Bond(Source_effort("F", _("F")), j))
+    g.add(Bond(j, Element_R("r", _("r"))))
+    g.add(Bond(j, Element_I("i", _("i"), _("p"))))
+    return g
+
+
+def _analytic(t, p0, F, i, r):
+    # Solution of p' = F - r * p / i
+    tau = i / r
+    return F * tau + (p0 - F * tau) * np.exp(-t / tau)
+
+
+@pytest.mark.parametrize("method", ["rk4", "dopri5"])
+def test_simulate_batch(method):
+    rhs = _ri_graph().compile_rhs()
+    assert rhs.parameters == [_("F"), _("i"), _("r")]
+
+    batch = 50
+    rng = np.random.default_rng(1)
+    x0 = rng.random((1, batch))
+    params = np.vstack(
+        [rng.random(batch), 1.0 + rng.random(batch), 1.0 + rng.random(batch)]
+    )
+    t = np.linspace(0.0, 2.0, 21)
+
+    result = simulate(rhs, x0, params, t, method=method, dt=0.01)
+    assert result.x.shape == (21, 1, batch)
+    expected = _analytic(t[:, None], x0[0], params[0], params[1], params[2])
+    assert np.allclose(result.x[:, 0, :], expected, rtol=1e-5, atol=1e-7)
+
+
+def test_simulate_graph_single():
+    result = simulate(_ri_graph(), [0.0], [1.0, 2.0, 4.0], [0.0, 1.0], method="dopri5")
+    assert result.x.shape == (2, 1)
+    assert np.isclose(result.x[-1, 0], _analytic(1.0, 0.0, 1.0, 2.0, 4.0))
+
+
+def test_simulate_to_file(tmp_path):
+    from bondgraph.trajectory import Trajectory, TrajectoryWriter
+
+    g = BondGraph()
+    j = JunctionEqualFlow("j")
+    g.add(Bond(Source_effort("F", _("F")), j))
+    resistor = Bond(j, Element_R("r", _("r")))
+    g.add(resistor)
+    g.add(Bond(j, Element_I("i", _("i"), _("p"))))
+    rhs = g.compile_rhs(outputs=[resistor.flow_symbol])
+
+    x0 = np.array([[0.0, 1.0]])
+    params = [1.0, 2.0, 4.0]
+    t = np.linspace(0.0, 2.0, 101)
+    path = str(tmp_path / "run.bgtraj")
+    result = simulate(rhs, x0, params, t, dt=0.01, output=path, decimation=10)
+    in_memory = simulate(rhs, x0, params, t, dt=0.01, decimation=10)
+
+    assert isinstance(result.x, np.memmap) or isinstance(result.x.base, np.memmap)
+    assert np.array_equal(result.t, t[::10])
+    assert result.x.shape == in_memory.x.shape == (11, 1, 2)
+    assert np.allclose(result.x, in_memory.x)
+    assert np.allclose(result.y, result.x / 2.0)
+    assert np.allclose(in_memory.y, result.y)
+
+    stored = Trajectory(path)
+    assert (stored.states, stored.outputs) == (["p"], ["f_2"])
+    assert stored.metadata["parameters"] == ["F", "i", "r"]
+
+    # Readers see committed rows while the file is being written
+    with TrajectoryWriter(path, ["p"], 10, commit_every=2) as writer:
+        for k in range(3):
+            writer.append(float(k), [k])
+        reader = Trajectory(path)
+        assert reader.rows == 2
+        writer.append(3.0, [3.0])
+        reader.refresh()
+        assert np.array_equal(reader.t, [0.0, 1.0, 2.0, 3.0])
+        assert np.array_equal(reader.x[:, 0], [0.0, 1.0, 2.0, 3.0])
+    with pytest.raises(ValueError):
+        TrajectoryWriter(path, ["p"], 0).append(0.0, [0.0])
+
+
+def test_simulate_vector_to_file(tmp_path):
+    from sympy import Idx, IndexedBase
+
+    from bondgraph.elements import Element_C
+    from bondgraph.trajectory import Trajectory
+
+    n = 5
+    k = Idx("k", n)
+    g = BondGraph()
+    j = JunctionEqualFlow("j")
+    g.add(Bond(Source_effort("F", _("F")), j, k))
+    resistor = Bond(j, Element_R("r", IndexedBase("r")[k]), k)
+    g.add(resistor)
+    g.add(Bond(j, Element_C("c", _("c"), IndexedBase("q")[k]), k))
+    rhs = g.compile_rhs(outputs=[_("F"), resistor.flow_symbol])
+
+    params = np.concatenate([[1.0, 0.5], 1.0 + np.arange(n)])
+    t = np.linspace(0.0, 1.0, 11)
+    path = str(tmp_path / "vector.bgtraj")
+    result = simulate(rhs, np.zeros(n), params, t, output=path)
+    in_memory = simulate(rhs, np.zeros(n), params, t)
+    assert result.x.shape == (11, n)
+    assert np.allclose(result.x, in_memory.x)
+    assert np.allclose(result.y, in_memory.y)
+
+    stored = Trajectory(path)
+    assert stored.state_channels == [n]
+    assert stored.output_channels == [1, n]
+    assert np.allclose(stored.state("q[k]"), in_memory.x)
+    assert np.allclose(stored.output("f_2[k]"), in_memory.y[:, 1:])
+
+
+def test_sensitivity():
+    g = _ri_graph()
+    p, F, i, r = _("p"), _("F"), _("i"), _("r")
+    sensitivity = g.get_sensitivity_equations([r, i])
+    dp_dr = sensitivity.sensitivities[(p, r)]
+    assert sensitivity.equations[dp_dr] == -r / i * dp_dr - p / i
+
+    rhs = g.compile_sensitivity([r, i])
+    assert rhs.states == [p, dp_dr, sensitivity.sensitivities[(p, i)]]
+
+    batch = 4
+    rng = np.random.default_rng(9)
+    params = np.vstack(
+        [rng.random(batch), 1.0 + rng.random(batch), 1.0 + rng.random(batch)]
+    )
+    x0 = np.zeros((3, batch))
+    t = np.linspace(0.0, 2.0, 11)
+    result = simulate(rhs, x0, params, t, method="dopri5", rtol=1e-10, atol=1e-12)
+
+    step = 1e-6
+    for row, index in ((1, 2), (2, 1)):
+        upper, lower = params.copy(), params.copy()
+        upper[index] += step
+        lower[index] -= step
+        expected = (
+            _analytic(t[:, None], 0.0, *upper) - _analytic(t[:, None], 0.0, *lower)
+        ) / (2 * step)
+        assert np.allclose(result.x[:, row, :], expected, rtol=1e-5, atol=1e-7)
@@ -0,0 +1,73 @@
+from bondgraph.core import Bond, BondGraph
+from bondgraph.elements import (
+    Element_R,
+    Element_I,
+    Element_C,
+    Source_effort,
+    Source_flow,
+)
+from bondgraph.junctions import JunctionEqualEffort, JunctionEqualFlow
+from bondgraph.submodels import Submodel
+
+from sympy import Symbol as _
+
+
+def _mass_damper():
+    # Effort port -> 1 -> I, R
+    port = Source_effort("port", _("u"))
+    j = JunctionEqualFlow("j")
+    template = BondGraph()
+    template.add(Bond(port, j))
+    template.add(Bond(j, Element_I("m", _("m"), _("p"))))
+    template.add(Bond(j, Element_R("d", _("d"))))
+    return Submodel("mass_damper", template, {"port": port})
+
+
+def test_submodel_instances():
+    F = _("F")
+    c = _("c")
+    q = _("q")
+
+    mass_damper = _mass_damper()
+    a = mass_damper.instantiate("a", shared=[_("d")])
+    b = mass_damper.instantiate("b", shared=[_("d")])
+
+    # Source -> 1 -> C, 0 -> both instances
+    g = BondGraph()
+    j1 = JunctionEqualFlow("j1")
+    j0 = JunctionEqualEffort("j0")
+    g.add(Bond(Source_flow("v", _("v")), j0))
+    g.add(Bond(j0, Element_C("c", c, q)))
+    g.add(Bond(j0, a.port("port")))
+    g.add(Bond(j0, b.port("port")))
+    g.add(Bond(Source_effort("F", F), j1))
+    eqs = g.get_state_equations()
+
+    p_a, m_a = _("p_a"), _("m_a")
+    p_b, m_b = _("p_b"), _("m_b")
+    assert set(eqs) == {q, p_a, p_b}
+    assert eqs[p_a] == q / c - _("d") * p_a / m_a
+    assert eqs[q].equals(_("v") - p_a / m_a - p_b / m_b)
+    assert g.get_parameters() == {_("v"), c, F, m_a, m_b, _("d")}
+
+    # Both instances share one derivation of the component
+    assert mass_damper._derived is not None
+    assert a.submodel is b.submodel
+
+
+def test_submodel_reversed_port():
+    F = _("F")
+
+    mass_damper = _mass_damper()
+    a = mass_damper.instantiate("a")
+
+    g = BondGraph()
+    j = JunctionEqualFlow("j")
+    g.add(Bond(Source_effort("F", F), j))
+    g.add(Bond(j, Element_R("r", _("r"))))
+    # Bond oriented out of the instance, so the port flow is negated
+    g.add(Bond(a.port("port"), j))
+    eqs = g.get_state_equations()
+
+    p_a, m_a = _("p_a"), _("m_a")
+    assert eqs[p_a].equals(-(F + _("r") * p_a / m_a) - _("d_a") * p_a / m_a)